@@ -1,16 +1,43 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, stream_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from flask_migrate import Migrate
-from application.models import db, User, Slot, Booking
+from application.models import db, User, Slot, Booking, JobRun
+from application.availability import AvailabilityCache
+from application.cache import create_cache
+from application.calendar_view import month_grid, parse_month
+from application.api import (
+    BOOKINGS, SLOTS, USERS, ApiError, booking_filters, parse_date, slot_filters, to_json, user_counts, user_filters
+)
+from application.accounts import AccountLookup, taken as account_taken
+from application.http_cache import StaticFingerprints, conditional_response, make_etag
+from application.database import configure_sqlite, engine_options, ping, pool_status
+from application.instrumentation import RequestMetrics
+from application.logs import setup_logging
+from application.maintenance import purge_old_slots
+from application.principal import PrincipalCache
+from application.ratelimit import RateLimiter
+from application.passwords import hash_password, needs_rehash, verify_password
+from application.versions import date_version, overall_version
+from application.scheduler import JobRunner, LeaderElection, prune_job_runs
+from application.booking import (
+    BOOKING_FILTERS, ClaimConflict, booking_listing, booking_stats, claim_slot, claim_slots,
+    exceeds_limits, lock_user, over_limits,
+)
+from application.slot_grid import create_slot_grid, count_slot_grid, iter_slot_grid_by_date
+from application.calendar_client import GoogleCalendarClient, build_event
+from application.calendar_reconcile import reconcile_calendar
+from application.calendar_sync import (
+    CalendarSyncWorker, FakeCalendarClient, enqueue_event_insert, enqueue_event_delete,
+    cancel_pending_inserts, flush_deletes
+)
 from datetime import datetime, timedelta
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 import os
+from functools import wraps
 from apscheduler.schedulers.background import BackgroundScheduler
 import atexit
+import click
 from datetime import date
-import logging
-from logging.handlers import RotatingFileHandler
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
 
 app = Flask(__name__)
@@ -19,21 +46,23 @@ app = Flask(__name__)
 config_name = os.environ.get('FLASK_ENV', 'development')
 app.config.from_object(config[config_name])
 
-# Set up logging for production
+if app.config['PROXY_FIX_X_FOR']:
+    # Behind a load balancer, take the client address from X-Forwarded-For
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=1)
+
+# Set up logging for production (JSON lines written by a background listener)
 if not app.debug and not app.testing:
     if not os.path.exists('logs'):
         os.mkdir('logs')
     
-    file_handler = RotatingFileHandler('logs/slot_booking.log', maxBytes=10240000, backupCount=10)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    
-    app.logger.setLevel(logging.INFO)
+    setup_logging(app, 'logs/slot_booking.log', use_queue=app.config['LOG_USE_QUEUE'])
     app.logger.info('Slot booking application startup')
 
+booking_log = app.logger.getChild('booking')
+
+# Content-hashed static URLs, served with long-lived immutable caching
+static_fingerprints = StaticFingerprints(app, max_age=app.config['STATIC_MAX_AGE'])
+
 # Security headers
 @app.after_request
 def after_request(response):
@@ -59,61 +88,150 @@ def dayfromdate(value):
     return value
 
 current_dir = os.path.abspath(os.path.dirname(__file__))
+app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
 db.init_app(app)
+# Per-endpoint wall, SQL and Calendar API time; exported at /metrics
+request_metrics = RequestMetrics()
+with app.app_context():
+    configure_sqlite(db.engine, app.config)
+    request_metrics.init_app(app, db.engine)
 
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)
 
+# Per-date free slot counts and slot lists for the teacher calendar
+availability_cache = AvailabilityCache(create_cache(
+    app.config['AVAILABILITY_CACHE_URL'],
+    maxsize=app.config['AVAILABILITY_CACHE_SIZE'],
+    default_ttl=app.config['AVAILABILITY_CACHE_TTL'],
+))
+
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+# current_user is a cached UserPrincipal, not an ORM User
+principal_cache = PrincipalCache(create_cache(
+    app.config['PRINCIPAL_CACHE_URL'],
+    maxsize=app.config['PRINCIPAL_CACHE_SIZE'],
+    default_ttl=app.config['PRINCIPAL_CACHE_TTL'],
+), enabled=app.config['PRINCIPAL_CACHE_TTL'] > 0)
+principal_cache.watch()
+
+# Registration username/email checks: cached EXISTS queries, rate limited per client
+account_lookup = AccountLookup(create_cache(
+    app.config['ACCOUNT_LOOKUP_CACHE_URL'],
+    maxsize=app.config['ACCOUNT_LOOKUP_CACHE_SIZE'],
+    default_ttl=app.config['ACCOUNT_LOOKUP_CACHE_TTL'],
+))
+check_availability_limiter = RateLimiter(
+    rate=app.config['CHECK_AVAILABILITY_RATE'], burst=app.config['CHECK_AVAILABILITY_BURST']
+)
+
 @login_manager.user_loader
 def load_user(user_id):
-    with db.session() as session:
-        return session.get(User, int(user_id))
+    return principal_cache.get(int(user_id))
 
 def delete_old_slots_job():
     """Background job to clean up old slots"""
     try:
         with app.app_context():
             today = datetime.today().date()
-            old_slots = Slot.query.filter(Slot.slot_date < today).all()
-            deleted_count = len(old_slots)
-            
-            for slot in old_slots:
-                db.session.delete(slot)
-            db.session.commit()
-            
-            app.logger.info(f"Deleted {deleted_count} old slot(s) before {today}.")
+            # Also drops the data versions of the purged dates, see application.versions
+            report = purge_old_slots(today, batch_size=app.config['CLEANUP_BATCH_SIZE'])
+            if report['oldest_date']:
+                availability_cache.forget_range(report['oldest_date'], today - timedelta(days=1))
+            app.logger.info(
+                f"Deleted {report['slots_deleted']} old slot(s) before {today} and archived "
+                f"{report['bookings_archived']} booking(s) in {report['batches']} batch(es), "
+                f"{report['elapsed_seconds']}s."
+            )
+            return report
     except Exception as e:
         app.logger.error(f"Error in delete_old_slots_job: {str(e)}")
         db.session.rollback()
-
-# Set up the scheduler to run the deletion job every day at midnight.
+        raise
+
+@app.cli.command('purge-old-slots')
+@click.option('--batch-size', type=int, default=None, help='Slots deleted per transaction.')
+def purge_old_slots_command(batch_size):
+    """Delete past slots and archive their bookings."""
+    if batch_size:
+        app.config['CLEANUP_BATCH_SIZE'] = batch_size
+    report = delete_old_slots_job()
+    if report:
+        click.echo(f"Removed {report['slots_deleted']} slot(s), archived {report['bookings_archived']} "
+                   f"booking(s) in {report['elapsed_seconds']}s.")
+
+def reconcile_calendar_job(full=False, dry_run=False):
+    """Diff bookings against Google Calendar and repair orphaned, duplicate and missing events"""
+    report = reconcile_calendar(
+        calendar_client, app.config['GOOGLE_CALENDAR_ID'], datetime.today().date(),
+        window_days=app.config['CALENDAR_RECONCILE_WINDOW_DAYS'],
+        time_zone=app.config['CALENDAR_TIME_ZONE'],
+        batch_size=app.config['CALENDAR_RECONCILE_BATCH_SIZE'],
+        full=full, dry_run=dry_run,
+    )
+    if report['reinserted'] and not dry_run:
+        calendar_sync_worker.notify()
+    app.logger.info(
+        f"Calendar reconciliation ({report['mode']}): {report['events_listed']} event(s) listed, "
+        f"{report['deleted']} deleted, {report['adopted']} adopted, {report['reinserted']} reinserted, "
+        f"{report['elapsed_seconds']}s."
+    )
+    return report
+
+@app.cli.command('reconcile-calendar')
+@click.option('--full', is_flag=True, help='List the whole window instead of the changes since the last run.')
+@click.option('--dry-run', is_flag=True, help='Report the repairs without making them.')
+def reconcile_calendar_command(full, dry_run):
+    """Repair differences between bookings and Google Calendar events."""
+    report = reconcile_calendar_job(full=full, dry_run=dry_run)
+    verb = 'Would have deleted' if dry_run else 'Deleted'
+    click.echo(f"{report['mode'].capitalize()} sync listed {report['events_listed']} event(s). {verb} "
+               f"{report['deleted']}, adopted {report['adopted']}, reinserted {report['reinserted']}.")
+
+def warm_availability_cache():
+    """Fill the shared availability cache for the rest of the current year"""
+    today = datetime.today().date()
+    counts = availability_cache.free_slot_counts(today, today.replace(month=12, day=31))
+    return {'days': len(counts)}
+
+# Every worker runs the scheduler, but jobs only execute in the worker holding
+# the scheduler lease (see application/scheduler.py).
 scheduler = BackgroundScheduler()
+scheduler_election = LeaderElection(lease_seconds=app.config['SCHEDULER_LEASE_SECONDS'])
+job_runner = JobRunner(app, scheduler_election, slow_job_seconds=app.config['SCHEDULER_SLOW_JOB_SECONDS'])
 
 def initialize_scheduler():
-    """Initialize the scheduler with database check"""
+    """Start the scheduler and the calendar sync worker in this process"""
     # Skip scheduler initialization if requested
-    if os.environ.get('SKIP_SCHEDULER') == 'true':
+    if os.environ.get('SKIP_SCHEDULER') == 'true' or not app.config['SCHEDULER_ENABLED']:
         app.logger.info("Skipping scheduler initialization")
         return
         
     try:
         if not scheduler.running:
-            with app.app_context():
-                # Only check if database is accessible
-                try:
-                    today = datetime.today().date()
-                    old_slots_exist = Slot.query.filter(Slot.slot_date < today).count() > 0
-                    if old_slots_exist:
-                        app.logger.info("Found old slots, scheduling cleanup job")
-                except Exception as db_error:
-                    app.logger.warning(f"Could not check for old slots, will schedule cleanup anyway: {db_error}")
-                
-                scheduler.add_job(func=delete_old_slots_job, trigger="cron", hour=0, minute=0, id="cleanup_job")
-                scheduler.start()
-                app.logger.info("Background scheduler started")
+            heartbeat = max(1, app.config['SCHEDULER_LEASE_SECONDS'] // 3)
+            scheduler.add_job(func=job_runner.heartbeat, trigger="interval", seconds=heartbeat,
+                              id="leader_heartbeat", next_run_time=datetime.now())
+            scheduler.add_job(func=job_runner.wrap('cleanup', delete_old_slots_job),
+                              trigger="cron", hour=0, minute=0, id="cleanup_job")
+            scheduler.add_job(func=job_runner.wrap('prune_job_runs', lambda: prune_job_runs(
+                                  app.config['SCHEDULER_JOB_RUN_RETENTION_DAYS'])),
+                              trigger="cron", hour=0, minute=30, id="prune_job_runs")
+            if app.config['CALENDAR_RECONCILE_ENABLED'] and app.config['CALENDAR_SYNC_ENABLED']:
+                scheduler.add_job(func=job_runner.wrap('reconcile_calendar', reconcile_calendar_job),
+                                  trigger="interval", minutes=app.config['CALENDAR_RECONCILE_INTERVAL_MINUTES'],
+                                  id="reconcile_calendar")
+            if not app.config['AVAILABILITY_CACHE_URL'].startswith('memory://'):
+                # Warming an in-process cache would only help the leader
+                scheduler.add_job(func=job_runner.wrap('warm_availability_cache', warm_availability_cache),
+                                  trigger="interval", minutes=app.config['AVAILABILITY_WARM_INTERVAL_MINUTES'],
+                                  id="warm_availability_cache")
+            scheduler.start()
+            app.logger.info(f"Background scheduler started as {scheduler_election.owner}")
+        # Pick up calendar writes left in the outbox by a previous run
+        calendar_sync_worker.start()
     except Exception as e:
         app.logger.error(f"Failed to initialize scheduler: {e}")
 
@@ -122,12 +240,50 @@ def safe_shutdown_scheduler():
     try:
         if scheduler.running:
             scheduler.shutdown()
+            with app.app_context():
+                # Let another worker take over without waiting for the lease to expire
+                scheduler_election.release()
             app.logger.info("Scheduler shutdown completed")
     except Exception as e:
         app.logger.error(f"Error during scheduler shutdown: {e}")
 
 atexit.register(safe_shutdown_scheduler)
 
+@app.cli.command('job-runs')
+@click.option('--limit', type=int, default=20, help='Number of runs to show.')
+def job_runs_command(limit):
+    """Show the most recent scheduled job runs."""
+    for run in JobRun.query.order_by(JobRun.started_at.desc()).limit(limit):
+        duration = f"{run.duration_seconds:.2f}s" if run.duration_seconds is not None else '-'
+        click.echo(f"{run.started_at:%Y-%m-%d %H:%M:%S}  {run.job_name:<24} {run.status:<8} {duration:>9}  {run.owner}")
+
+@app.route('/healthz')
+def healthz():
+    """Liveness check for the load balancer: DB round trip, pool usage and Calendar circuit state"""
+    health = {'status': 'ok', 'pool': pool_status(db.engine)}
+    breaker = getattr(calendar_client, 'breaker', None)
+    if breaker is not None:
+        # Informational only: bookings keep working while Google is down
+        health['calendar_circuit'] = breaker.state
+    try:
+        health['db_ping_ms'] = ping(db.engine)
+    except Exception as e:
+        app.logger.error(f"Health check database ping failed: {e}")
+        health.update(status='error', error='database unavailable')
+        return jsonify(health), 503
+    return jsonify(health)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (this worker's counters only)"""
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        # Per-route timings are not for the public; unset token means no endpoint
+        abort(404)
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    return app.response_class(request_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     return redirect(url_for('login'))
@@ -173,22 +329,20 @@ def register():
             return render_template('register.html', message=message)
         
         try:
-            # Check if the username already exists
-            existing_user = User.query.filter_by(username=username).first()
-            if existing_user:
+            # Check (case-insensitively) whether the username or email is taken, in one query
+            taken = account_taken({'username': username, 'email': email})
+            if taken['username']:
                 message = 'Username already exists. Please choose a different one.'
                 return render_template('register.html', message=message)
             
-            # Check if the email already exists
-            existing_email = User.query.filter_by(email=email).first()
-            if existing_email:
+            if taken['email']:
                 message = 'Email address already exists. Please use a different email.'
                 return render_template('register.html', message=message)
             
             # Create new user with proper capitalization
             new_user = User(
                 username=username, 
-                password=password, 
+                password=hash_password(password, app.config['PASSWORD_HASH_METHOD']), 
                 email=email, 
                 first_name=first_name.title(), 
                 last_name=last_name.title(), 
@@ -198,6 +352,8 @@ def register():
             # Add the new user to the database
             db.session.add(new_user)
             db.session.commit()
+            # Cached "available" answers for these values are now wrong
+            account_lookup.invalidate({'username': username, 'email': email})
             
             app.logger.info(f'New user registered: {username} ({email})')
             flash('User registered successfully!')
@@ -213,30 +369,36 @@ def register():
 
 @app.route('/check_availability', methods=['POST'])
 def check_availability():
-    data = request.get_json()
+    """Whether usernames/emails are free; accepts {"field", "value"} or {"fields": {field: value}}"""
+    allowed, retry_after = check_availability_limiter.hit(request.remote_addr)
+    if not allowed:
+        response = jsonify({'error': 'Too many requests'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    
+    data = request.get_json(silent=True) or {}
+    if 'fields' in data:
+        fields = data['fields'] if isinstance(data['fields'], dict) else {}
+        values = {field: value for field, value in fields.items() if isinstance(value, str)}
+        return jsonify({'available': {field: True for field in fields} | account_lookup.available(values)})
+    
     field = data.get('field')
     value = data.get('value')
-    
-    if not field or not value:
+    if not field or not isinstance(value, str) or not value.strip():
         return jsonify({'available': True})
-    
-    if field == 'username':
-        existing = User.query.filter_by(username=value).first()
-        return jsonify({'available': existing is None})
-    elif field == 'email':
-        existing = User.query.filter_by(email=value).first()
-        return jsonify({'available': existing is None})
-    
-    return jsonify({'available': True})
+    return jsonify({'available': account_lookup.available({field: value}).get(field, True)})
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         user = User.query.filter_by(username=request.form['username']).first()
-        if user and user.password == request.form['password']:
+        if user and verify_password(user.password, request.form['password']):
+            if needs_rehash(user.password, app.config['PASSWORD_HASH_METHOD']):
+                # Upgrade outdated hashes now that we have the password
+                user.password = hash_password(request.form['password'], app.config['PASSWORD_HASH_METHOD'])
+                db.session.commit()
             login_user(user)
             if user.role == 'admin':
-                delete_old_slots_job()
                 return redirect(url_for('admin_dashboard'))
             return redirect(url_for('teacher_dashboard'))
         message = 'Invalid username or password'
@@ -247,32 +409,37 @@ def login():
 @app.route('/teacher_slots', methods=['GET'])
 @login_required
 def teacher_slots():
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     selected_date = request.args.get('date')
+    if is_ajax and selected_date:
+        try:
+            slot_date = datetime.strptime(selected_date, '%Y-%m-%d').date()
+        except ValueError:
+            abort(400)
+        # Revalidated by data version: repeat clicks on a date cost one counter lookup
+        version = availability_cache.version(slot_date)
+        return conditional_response(
+            make_etag('slots-table', selected_date, version, salt=app.config['ETAG_SALT']),
+            lambda: render_template('slots_table.html', selected_date=selected_date,
+                                    slots=availability_cache.available_slots_on(slot_date, version))
+        )
+
+    # The calendar shows the current year one month at a time; the grid itself
+    # is precomputed, only the dates with free slots are looked up per request
     today = date.today()
-    # Show all days in the current year
-    first_day = today.replace(month=1, day=1)
-    last_day = today.replace(month=12, day=31)
-    calendar_days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
-
-    # Find all dates with available slots
-    slots_all = Slot.query.filter(Slot.available == True, ~Slot.bookings.any()).all()
-    available_dates = {slot.slot_date.strftime('%Y-%m-%d') for slot in slots_all}
-
-    slots = []
-    if selected_date:
-        date_obj = datetime.strptime(selected_date, '%Y-%m-%d').date()
-        slots = [slot for slot in slots_all if slot.slot_date == date_obj]
-
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' and selected_date:
-        return render_template('slots_table.html', slots=slots, selected_date=selected_date)
-
-    return render_template(
-        'teacher_slots.html',
-        calendar_days=calendar_days,
-        available_dates=available_dates,
-        selected_date=selected_date,
-        slots=slots
-    )
+    month = month_grid(today.year, parse_month(request.args.get('month'), today.year) or today.month)
+
+    def render_month(template):
+        available_dates = {d.isoformat() for d in availability_cache.available_dates(month.first_day, month.last_day)}
+        return render_template(template, month=month, available_dates=available_dates)
+
+    if is_ajax:
+        versions = availability_cache.versions(month.first_day, month.last_day)
+        return conditional_response(
+            make_etag('calendar-month', month.key, *sorted(versions.items()), salt=app.config['ETAG_SALT']),
+            lambda: render_month('calendar_month.html')
+        )
+    return render_month('teacher_slots.html')
 
 # Updated teacher dashboard to show the teacher's bookings
 @app.route('/teacher')
@@ -280,8 +447,39 @@ def teacher_slots():
 def teacher_dashboard():
     if current_user.role != "teacher":
         return redirect(url_for('login'))
-    bookings = Booking.query.filter_by(user_id=current_user.id).all()
-    return render_template('teacher_dashboard.html', bookings=bookings,current_user=current_user, current_date=date.today())
+    today = date.today()
+    booking_filter = request.args.get('filter', 'all')
+    if booking_filter not in BOOKING_FILTERS:
+        booking_filter = 'all'
+    pagination = booking_listing(today, user_id=current_user.id, booking_filter=booking_filter).paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=app.config['MAX_SLOTS_PER_PAGE'],
+        error_out=False
+    )
+    return render_template('teacher_dashboard.html', bookings=pagination.items, pagination=pagination,
+                           stats=booking_stats(today, user_id=current_user.id), booking_filter=booking_filter,
+                           current_user=current_user, current_date=today)
+
+def free_slots_page(template, search_date, search_date_str):
+    """First page of free slots for the admin slot pages; the rest is fetched from /api/v1/slots"""
+    api_args = {'available': 'true', 'booked': 'false', 'date': search_date.isoformat() if search_date else None}
+    try:
+        sort = SLOTS.parse_sort(request.args.get('sort'))
+    except ApiError:
+        sort = SLOTS.default_sort
+    fields = ['id', 'slot_date', 'slot_start_time', 'slot_end_time', 'available']
+
+    def render():
+        page = SLOTS.page(slot_filters(api_args), fields=fields, sort=sort, limit=app.config['MAX_SLOTS_PER_PAGE'])
+        return render_template(template, slots=page['data'], next_cursor=page['next_cursor'], sort=sort,
+                               search_date=search_date_str,
+                               api_url=url_for('api_slots', sort=sort, fields=','.join(fields),
+                                               **{k: v for k, v in api_args.items() if v}))
+
+    version = date_version(search_date) if search_date else overall_version()
+    return conditional_response(
+        make_etag(template, search_date or 'all', sort, version, salt=app.config['ETAG_SALT']), render
+    )
 
 @app.route('/admin/slots', methods=['GET'])
 @login_required
@@ -300,12 +498,7 @@ def admin_slots():
     else:
         search_date = None
 
-    if search_date:
-        slots = Slot.query.filter(Slot.slot_date == search_date, Slot.available == True, ~Slot.bookings.any()).all()
-    else:
-        slots = Slot.query.filter(Slot.available == True, ~Slot.bookings.any()).all()
-
-    return render_template('admin_slots.html', slots=slots, search_date=search_date_str)
+    return free_slots_page('admin_slots.html', search_date, search_date_str)
 
 @app.route('/admin/create_slot', methods=['GET'])
 @login_required
@@ -327,6 +520,7 @@ def set_slot_availability(slot_id):
     new_status = request.form.get('available') == 'true'
     slot.available = new_status
     db.session.commit()
+    availability_cache.invalidate([slot.slot_date])
     # Return the updated status as JSON.
     return jsonify({'success': True, 'available': new_status})
 
@@ -336,8 +530,18 @@ def set_slot_availability(slot_id):
 def admin_dashboard():
     if current_user.role != 'admin':
         return redirect(url_for('login'))
-    bookings = Booking.query.all()
-    return render_template('admin_dashboard.html', bookings=bookings, current_user=current_user, current_date=date.today())
+    today = date.today()
+    booking_filter = request.args.get('filter', 'all')
+    if booking_filter not in BOOKING_FILTERS:
+        booking_filter = 'all'
+    pagination = booking_listing(today, booking_filter=booking_filter).paginate(
+        page=request.args.get('page', 1, type=int),
+        per_page=app.config['MAX_SLOTS_PER_PAGE'],
+        error_out=False
+    )
+    return render_template('admin_dashboard.html', bookings=pagination.items, pagination=pagination,
+                           stats=booking_stats(today), booking_filter=booking_filter,
+                           current_user=current_user, current_date=today)
 
 @app.route('/admin/users')
 @login_required
@@ -346,29 +550,58 @@ def admin_users():
         flash('Permission denied!')
         return redirect(url_for('teacher_dashboard'))
     
-    users = User.query.all()
-    return render_template('admin_users.html', users=users, current_user=current_user, current_date=date.today())
+    fields = ['id', 'username', 'email', 'first_name', 'last_name', 'role', 'booking_count']
+    page = USERS.page(fields=fields, limit=app.config['MAX_SLOTS_PER_PAGE'])
+    return render_template('admin_users.html', users=page['data'], next_cursor=page['next_cursor'],
+                           counts=user_counts(), api_url=url_for('api_users', fields=','.join(fields)),
+                           current_user=current_user, current_date=date.today())
+
+def booking_limits():
+    return {
+        'max_upcoming': app.config['MAX_UPCOMING_BOOKINGS_PER_TEACHER'],
+        'max_per_day': app.config['MAX_BOOKINGS_PER_TEACHER_PER_DAY'],
+    }
+
+def booking_metadata(description):
+    return {
+        "username" : current_user.username,
+        "email" : current_user.email,
+        "full_name": current_user.full_name,
+        "description": description
+    }
 
 @app.route('/book/<int:slot_id>', methods=['POST'])
 @login_required
 def book_slot(slot_id):
     slot = Slot.query.get_or_404(slot_id)
-    existing_booking = Booking.query.filter_by(slot_id=slot.id).first()
-    if not existing_booking and slot.available:
-        usersearch = User.query.filter_by(id=current_user.id).first()
-        description = request.form.get('description', 'None')
-        metadata = {
-            "username" : usersearch.username,
-            "email" : usersearch.email,
-            "full_name": f"{usersearch.first_name} {usersearch.last_name}",
-            "description": description
-        }
-        event_id = add_event_to_calendar(slot,metadata)
-        new_booking = Booking(user_id=current_user.id, slot_id=slot.id, event_id=event_id, description=description)
-        db.session.add(new_booking)
+    description = request.form.get('description', 'None')
+    limits = booking_limits()
+    if any(limits.values()):
+        lock_user(current_user.id)
+    if over_limits([slot], current_user.id, date.today(), **limits):
+        booking_log.info('Booking limit reached', extra={'slot_id': slot.id, 'user_id': current_user.id})
+        flash('You have reached your booking limit.')
+        return render_template('booking_confirmation.html', slot=slot, description=description)
+    # The unique constraint on booking.slot_id decides who gets the slot
+    new_booking = claim_slot(slot, current_user.id, description)
+    if new_booking is not None and exceeds_limits(current_user.id, date.today(), [slot.slot_date], **limits):
+        # Another booking by this teacher committed since the check above
+        db.session.rollback()
+        flash('You have reached your booking limit.')
+        return render_template('booking_confirmation.html', slot=slot, description=description)
+    if new_booking is not None:
+        # The calendar event is created by the sync worker after this commit
+        enqueue_event_insert(new_booking, build_event(slot, booking_metadata(description),
+                                                      app.config['CALENDAR_TIME_ZONE']))
         db.session.commit()
-        flash('Slot booked and added to Google Calendar!')
+        availability_cache.invalidate([slot.slot_date])
+        calendar_sync_worker.notify()
+        booking_log.info('Slot booked', extra={
+            'booking_id': new_booking.id, 'slot_id': slot.id, 'user_id': current_user.id,
+        })
+        flash('Slot booked! It will appear on Google Calendar shortly.')
     else:
+        booking_log.info('Slot already booked or unavailable', extra={'slot_id': slot.id, 'user_id': current_user.id})
         flash('Slot already booked or unavailable!')
     return render_template('booking_confirmation.html', slot=slot, description=description)
 
@@ -385,17 +618,25 @@ def confirm_slot(slot_id):
 @login_required
 def delete_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
+    slot_date = booking.slot.slot_date if booking.slot else None
     try:
-        remove_event_from_calendar(booking.event_id)
-    except Exception as e:
-        print(f"Error removing event from Google Calendar: {e}")
-    try:
+        if booking.event_id:
+            enqueue_event_delete(booking.event_id, booking_id=booking.id)
+        else:
+            # Event not created yet; an insert already in flight is undone by the worker
+            cancel_pending_inserts([booking.id])
         db.session.delete(booking)
         db.session.commit()
-        print('Booking deleted and event removed from Google Calendar!')
+        if slot_date:
+            availability_cache.invalidate([slot_date])
+        calendar_sync_worker.notify()
+        booking_log.info('Booking deleted', extra={
+            'booking_id': booking_id, 'slot_id': booking.slot_id, 'user_id': current_user.id,
+            'event_id': booking.event_id,
+        })
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting booking: {e}")
+        booking_log.error(f'Error deleting booking: {e}', extra={'booking_id': booking_id})
         flash('An error occurred while deleting the booking.')
     
     if current_user.role == 'admin':
@@ -426,12 +667,7 @@ def delete_slots():
     else:
         search_date = None
 
-    if search_date:
-        slots = Slot.query.filter(Slot.slot_date == search_date, Slot.available == True, ~Slot.bookings.any()).all()
-    else:
-        slots = Slot.query.filter(Slot.available == True, ~Slot.bookings.any()).all()
-        
-    return render_template('delete_slots.html', slots=slots, search_date=search_date_str)
+    return free_slots_page('delete_slots.html', search_date, search_date_str)
 
 
 @app.route('/admin/create_bulk_slots', methods=['GET', 'POST'])
@@ -463,38 +699,18 @@ def create_bulk_slots():
             flash("Invalid date or time format.")
             return redirect(url_for('create_bulk_slots'))
         
-        # Compute candidate dates (exclude the specified days)
-        candidate_dates = []
-        current_date = start_date
-        while current_date <= end_date:
-            day_name = current_date.strftime('%A').lower()
-            if day_name not in excluded:
-                candidate_dates.append(current_date)
-            current_date += timedelta(days=1)
-        
-        # For each candidate date, compute possible slots
-        candidate_slots = []
-        for cdate in candidate_dates:
-            current_dt = datetime.combine(cdate, start_time)
-            end_dt     = datetime.combine(cdate, end_time)
-            slots_for_date = []
-            while current_dt + timedelta(minutes=duration) <= end_dt:
-                slot_start = current_dt.time()
-                slot_end   = (current_dt + timedelta(minutes=duration)).time()
-                slots_for_date.append({
-                    'start': slot_start.strftime('%H:%M'),
-                    'end': slot_end.strftime('%H:%M')
-                })
-                current_dt += timedelta(minutes=duration)
-            if slots_for_date:
-                candidate_slots.append({
-                    'date': cdate.strftime('%Y-%m-%d'),
-                    'slots': slots_for_date
-                })
+        try:
+            slot_count, day_count = count_slot_grid(start_date, end_date, start_time, end_time, duration, excluded)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(url_for('create_bulk_slots'))
         
-        # Render preview page with computed candidate_slots
-        return render_template('admin_bulk_slots_preview.html',
+        # Stream the preview so large ranges never sit in memory as one list
+        candidate_slots = iter_slot_grid_by_date(start_date, end_date, start_time, end_time, duration, excluded)
+        return stream_template('admin_bulk_slots_preview.html',
                                candidate_slots=candidate_slots,
+                               slot_count=slot_count,
+                               day_count=day_count,
                                start_date=start_date_str,
                                end_date=end_date_str,
                                start_time=start_time_str,
@@ -533,38 +749,15 @@ def confirm_bulk_slots():
         flash("Invalid date or time format.")
         return redirect(url_for('create_bulk_slots'))
     
-    created_count = 0
-    skipped_count = 0
-    current_date = start_date
-    while current_date <= end_date:
-        day_name = current_date.strftime('%A').lower()
-        if day_name not in excluded:
-            current_dt = datetime.combine(current_date, start_time)
-            end_dt     = datetime.combine(current_date, end_time)
-            while current_dt + timedelta(minutes=duration) <= end_dt:
-                slot_start = current_dt.time()
-                slot_end   = (current_dt + timedelta(minutes=duration)).time()
-                # Check if slot already exists
-                existing_slot = Slot.query.filter_by(
-                    slot_date=current_date,
-                    slot_start_time=slot_start,
-                    slot_end_time=slot_end
-                ).first()
-                if existing_slot:
-                    skipped_count += 1
-                else:
-                    new_slot = Slot(
-                        slot_date=current_date,
-                        slot_start_time=slot_start,
-                        slot_end_time=slot_end,
-                        available=True
-                    )
-                    db.session.add(new_slot)
-                    created_count += 1
-                current_dt += timedelta(minutes=duration)
-        current_date += timedelta(days=1)
-    
+    try:
+        created_count, skipped_count = create_slot_grid(
+            start_date, end_date, start_time, end_time, duration, excluded
+        )
+    except ValueError as e:
+        flash(str(e))
+        return redirect(url_for('create_bulk_slots'))
     db.session.commit()
+    availability_cache.invalidate_range(start_date, end_date)
     flash(f'{created_count} slots created; {skipped_count} slots skipped because they already exist.')
     return redirect(url_for('admin_dashboard'))
 
@@ -572,48 +765,76 @@ def confirm_bulk_slots():
 #                    Google Calendar API integration                    #
 #########################################################################
 
-def add_event_to_calendar(slot,metadata):
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
-    print("Loading service account credentials...")
-    credentials = service_account.Credentials.from_service_account_file(
-        'google_credentials.json', scopes=SCOPES)
-    print("Credentials loaded successfully. Building the Google Calendar service...")
-    service = build('calendar', 'v3', credentials=credentials)
-
-    start_dt = datetime.combine(slot.slot_date, slot.slot_start_time)
-    end_dt = start_dt + timedelta(hours=1)
-    print(f"Creating an event from {start_dt.isoformat()} to {end_dt.isoformat()}")
-
-    event = {
-        'summary': f'Name-{metadata["full_name"]}, Email-{metadata["email"]}, Description-{metadata["description"]}',  
-        'start': {'dateTime': start_dt.isoformat(), 'timeZone': 'Asia/Kolkata'},
-        'end': {'dateTime': end_dt.isoformat(), 'timeZone': 'Asia/Kolkata'},
-    }
-    print("Event details:", event)
-
-    try:
-        created_event = service.events().insert(calendarId='36b6b142b66921e3359c57c8134b2bdaf3e274e3cd5d6752677b6f8321bbaf70@group.calendar.google.com', body=event).execute()
-        print("Google Calendar API response:", created_event)
-        if created_event:
-            print('Event successfully added to Google Calendar!')
-            return created_event.get('id')
-        else:
-            print('Failed to add event to Google Calendar.')
-        
-    except Exception as e:
-        print("Error occurred while adding event:", e)
-
-def remove_event_from_calendar(event_id):
-    SCOPES = ['https://www.googleapis.com/auth/calendar']
-    credentials = service_account.Credentials.from_service_account_file(
-        'google_credentials.json', scopes=SCOPES)
-    service = build('calendar', 'v3', credentials=credentials)
-
+# Built lazily and shared by every thread in this process
+if app.config['CALENDAR_CLIENT'] == 'fake':
+    calendar_client = FakeCalendarClient.from_config(app.config)
+else:
+    calendar_client = GoogleCalendarClient.from_config(app.config)
+request_metrics.instrument_client(calendar_client, 'google_calendar',
+                                  ('insert_event', 'insert_events', 'delete_event', 'delete_events'))
+
+calendar_sync_worker = CalendarSyncWorker(
+    app, calendar_client, interval=app.config['CALENDAR_SYNC_INTERVAL_SECONDS'],
+    concurrency=app.config['CALENDAR_SYNC_CONCURRENCY'],
+)
+atexit.register(calendar_sync_worker.stop)
+
+def remove_slots(slot_ids):
+    """Delete the slots with their bookings and queue the removal of their calendar events"""
+    bookings = db.session.query(Booking.id, Booking.slot_id, Booking.event_id) \
+        .filter(Booking.slot_id.in_(slot_ids)).all()
+    
+    # Bookings whose event was never created just need their insert dropped
+    cancel_pending_inserts([b.id for b in bookings if not b.event_id])
+    # Only the first batch is sent from this request; each batch can take up to
+    # the Calendar timeout, so the rest is left to the sync worker
+    inline = app.config['CALENDAR_INLINE_DELETE_LIMIT']
+    delete_tasks = [
+        enqueue_event_delete(b.event_id, booking_id=b.id, claimed=i < inline)
+        for i, b in enumerate(b for b in bookings if b.event_id)
+    ]
+    
+    slot_dates = {d for (d,) in db.session.query(Slot.slot_date).filter(Slot.id.in_(slot_ids)).distinct()}
+    Booking.query.filter(Booking.slot_id.in_(slot_ids)).delete(synchronize_session=False)
+    deleted_count = Slot.query.filter(Slot.id.in_(slot_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    availability_cache.invalidate(slot_dates)
+    return bookings, delete_tasks, deleted_count
+
+def flush_slot_events(bookings, delete_tasks):
+    """Send the claimed deletes of ``remove_slots`` and describe each booking's calendar event"""
+    # Slots are gone; now remove the first batch of their calendar events.
+    # Anything that fails stays in the outbox for the sync worker to retry.
+    inline = app.config['CALENDAR_INLINE_DELETE_LIMIT']
+    results = flush_deletes(calendar_client, delete_tasks[:inline], batch_size=max(inline, 1),
+                            max_attempts=app.config['CALENDAR_SYNC_MAX_ATTEMPTS'],
+                            backoff_seconds=app.config['CALENDAR_SYNC_BACKOFF_SECONDS'])
+    db.session.commit()
+    if len(delete_tasks) > inline or any(error is not None for error in results.values()):
+        calendar_sync_worker.notify()
+    
+    return [{
+        'booking_id': b.id,
+        'slot_id': b.slot_id,
+        'event_id': b.event_id,
+        'queued': bool(b.event_id) and b.event_id not in results,
+        'success': not b.event_id or (b.event_id in results and results[b.event_id] is None),
+        'error': results.get(b.event_id) if b.event_id else None,
+    } for b in bookings]
+
+def delete_slots_response(slot_ids):
     try:
-        service.events().delete(calendarId='36b6b142b66921e3359c57c8134b2bdaf3e274e3cd5d6752677b6f8321bbaf70@group.calendar.google.com', eventId=event_id).execute()
-        print('Event successfully removed from Google Calendar!')
+        bookings, delete_tasks, deleted_count = remove_slots(slot_ids)
     except Exception as e:
-        print("Error occurred while removing event:", e)
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'deleted_count': deleted_count,
+        'cancelled_bookings': len(bookings),
+        'calendar': flush_slot_events(bookings, delete_tasks)
+    })
 
 @app.route('/admin/delete_slot/<int:slot_id>', methods=['POST'])
 @login_required
@@ -622,9 +843,7 @@ def delete_slot(slot_id):
         return jsonify({'success': False, 'error': 'Permission denied!'}), 403
     
     slot = Slot.query.get_or_404(slot_id)
-    db.session.delete(slot)
-    db.session.commit()
-    return jsonify({'success': True})
+    return delete_slots_response([slot.id])
 
 @app.route('/admin/delete_slots_bulk', methods=['POST'])
 @login_required
@@ -637,18 +856,122 @@ def delete_slots_bulk():
         return jsonify({'success': False, 'error': 'No slots selected!'}), 400
     
     try:
-        deleted_count = 0
-        for slot_id in slot_ids:
-            slot = Slot.query.get(slot_id)
-            if slot:
-                db.session.delete(slot)
-                deleted_count += 1
-        
-        db.session.commit()
-        return jsonify({'success': True, 'deleted_count': deleted_count})
-    except Exception as e:
+        slot_ids = [int(slot_id) for slot_id in slot_ids]
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid slot ids!'}), 400
+    
+    return delete_slots_response(slot_ids)
+
+# JSON API: keyset-paginated listings (see application/api.py) and batch booking
+def api_login_required(*roles):
+    """Like login_required, but answers with a JSON 401/403 instead of redirecting"""
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not current_user.is_authenticated:
+                raise ApiError('Authentication required', 401)
+            if roles and current_user.role not in roles:
+                raise ApiError('Permission denied', 403)
+            return view(*args, **kwargs)
+        return wrapped
+    return decorator
+
+def api_page(listing, filters):
+    limit = request.args.get('limit', app.config['MAX_SLOTS_PER_PAGE'], type=int)
+    if limit < 1:
+        raise ApiError('limit must be positive')
+    limit = min(limit, app.config['API_MAX_PAGE_SIZE'])
+    page = listing.page(
+        filters,
+        fields=listing.parse_fields(request.args.get('fields')),
+        sort=listing.parse_sort(request.args.get('sort')),
+        cursor=request.args.get('cursor'),
+        limit=limit,
+    )
+    return jsonify({**to_json(page), 'limit': limit})
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+@app.route('/api/v1/slots')
+@api_login_required()
+def api_slots():
+    args = request.args.to_dict()
+    if current_user.role != 'admin':
+        # Teachers only ever see the slots they could book
+        args.update(available='true', booked='false')
+    filters = slot_filters(args)
+    # Slot listings change only through dated writes, so they revalidate by data version
+    version = date_version(parse_date(args['date'], 'date')) if args.get('date') else overall_version()
+    return conditional_response(
+        make_etag('api-slots', current_user.role, request.query_string.decode(), version,
+                  salt=app.config['ETAG_SALT']),
+        lambda: api_page(SLOTS, filters)
+    )
+
+@app.route('/api/v1/bookings')
+@api_login_required()
+def api_bookings():
+    args = request.args.to_dict()
+    if current_user.role != 'admin':
+        args['user_id'] = str(current_user.id)
+    return api_page(BOOKINGS, booking_filters(args, date.today()))
+
+@app.route('/api/v1/users')
+@api_login_required('admin')
+def api_users():
+    return api_page(USERS, user_filters(request.args))
+
+@app.route('/book/batch', methods=['POST'])
+@api_login_required()
+def book_batch():
+    """Book several slots in one transaction: ``{"slot_ids": [...], "description": ..., "atomic": true}``
+
+    Atomic requests book every slot or none (409); otherwise each slot that
+    can be booked is, and the response lists the outcome per slot.
+    """
+    payload = request.get_json(silent=True) or {}
+    slot_ids = payload.get('slot_ids')
+    if not isinstance(slot_ids, list) or not slot_ids or \
+            not all(isinstance(slot_id, int) and not isinstance(slot_id, bool) for slot_id in slot_ids):
+        raise ApiError('slot_ids must be a non-empty list of integers')
+    if len(set(slot_ids)) > app.config['BATCH_BOOKING_MAX_SLOTS']:
+        raise ApiError(f"At most {app.config['BATCH_BOOKING_MAX_SLOTS']} slots can be booked at once")
+    atomic = payload.get('atomic', True)
+    if not isinstance(atomic, bool):
+        raise ApiError('atomic must be true or false')
+    description = str(payload.get('description') or 'None')
+
+    try:
+        results, claimed = claim_slots(slot_ids, current_user.id, description, date.today(),
+                                       atomic=atomic, limits=booking_limits())
+    except ClaimConflict:
         db.session.rollback()
-        return jsonify({'success': False, 'error': str(e)}), 500
+        booking_log.warning('Batch booking gave up after repeated conflicts', extra={
+            'user_id': current_user.id, 'slot_ids': slot_ids,
+        })
+        raise ApiError('These slots are being booked concurrently; please try again', 409)
+    booking_ids = {}
+    if claimed:
+        metadata = booking_metadata(description)
+        for booking, slot in claimed:
+            # All the inserts are sent to Google as one batch request by the sync worker
+            enqueue_event_insert(booking, build_event(slot, metadata, app.config['CALENDAR_TIME_ZONE']))
+            booking_ids[slot.id] = booking.id
+        db.session.commit()
+        availability_cache.invalidate({slot.slot_date for _, slot in claimed})
+        calendar_sync_worker.notify()
+    booking_log.info(f'Batch booking: {len(claimed)} of {len(results)} slot(s) booked', extra={
+        'user_id': current_user.id, 'slot_ids': list(results), 'atomic': atomic,
+    })
+    return jsonify({
+        'success': bool(claimed),
+        'atomic': atomic,
+        'booked': len(claimed),
+        'results': [{'slot_id': slot_id, 'status': status, 'booking_id': booking_ids.get(slot_id)}
+                    for slot_id, status in results.items()],
+    }), 200 if claimed or not atomic else 409
 
 # Error handlers for production
 @app.errorhandler(404)
@@ -0,0 +1,61 @@
+"""
+Username and email availability for registration.
+
+Existence is tested case-insensitively with ``EXISTS`` subqueries on
+``lower(username)`` / ``lower(email)``, served by the ``ix_user_*_lower``
+expression indexes; all requested fields are answered by one SELECT.
+Answers, both "taken" and "available", are cached briefly per normalised
+value; ``register()`` invalidates the values it has just claimed.
+"""
+
+from sqlalchemy import exists, func, select
+
+from application.models import db, User
+
+FIELDS = {'username': User.username, 'email': User.email}
+
+
+def normalise(value):
+    return (value or '').strip().lower()
+
+
+def taken(values):
+    """``{field: bool}`` for a ``{field: value}`` mapping, in one query"""
+    values = {field: normalise(value) for field, value in values.items() if field in FIELDS}
+    if not values:
+        return {}
+    row = db.session.execute(select(*[
+        exists().where(func.lower(FIELDS[field]) == value).label(field)
+        for field, value in values.items()
+    ])).one()
+    return {field: bool(row._mapping[field]) for field in values}
+
+
+class AccountLookup:
+    """``taken()`` behind a cache backend keyed by field and normalised value"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(field, value):
+        return f'account:{field}:{value}'
+
+    def available(self, values):
+        """``{field: bool}`` telling whether each value can still be registered"""
+        values = {field: normalise(value) for field, value in values.items()
+                  if field in FIELDS and normalise(value)}
+        keys = {field: self._key(field, value) for field, value in values.items()}
+        cached = self.backend.get_many(keys.values())
+        result = {field: not cached[key] for field, key in keys.items() if key in cached}
+
+        missing = {field: value for field, value in values.items() if field not in result}
+        if missing:
+            found = taken(missing)
+            self.backend.set_many({keys[field]: is_taken for field, is_taken in found.items()})
+            result.update({field: not is_taken for field, is_taken in found.items()})
+        return result
+
+    def invalidate(self, values):
+        self.backend.delete_many([self._key(field, normalise(value)) for field, value in values.items()
+                                  if field in FIELDS])
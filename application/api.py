@@ -0,0 +1,274 @@
+"""
+JSON listings of slots, bookings and users for ``/api/v1``.
+
+Every listing is keyset (seek) paginated: rows are ordered by a sort key that
+ends in the primary key, and the next page starts strictly after the last row
+of the previous one, e.g. ``(slot_date, slot_start_time, id) > (?, ?, ?)``.
+The database walks the index from that point instead of skipping an OFFSET,
+so fetching page 500 costs the same as fetching page 1. The position is
+handed to the client as an opaque ``cursor``; it records the sort it was
+made for and is rejected under any other.
+
+Listings select only the columns behind the requested ``fields`` (plus the
+sort key) rather than loading ORM objects. Filters are applied in SQL. The
+admin pages render their first page from the same listings and fetch the
+rest from the API.
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, time
+
+from sqlalchemy import func, select, tuple_
+
+from application.models import db, Booking, Slot, User
+
+
+class ApiError(Exception):
+    """Client error reported as ``{"error": message}`` with ``status``"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _parse_value(column, value):
+    python_type = column.type.python_type
+    try:
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type is time:
+            return time.fromisoformat(value)
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise ApiError('Invalid cursor')
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def parse_bool(value, name):
+    if value is None:
+        return None
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ApiError(f'{name} must be true or false')
+
+
+def parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f'{name} must be a date (YYYY-MM-DD)')
+
+
+class Listing:
+    """One paginated resource: its columns, sort keys and default fields.
+
+    ``columns`` maps field names to column expressions, ``sorts`` maps sort
+    names to the fields of their key (ending in a unique one). ``-name``
+    sorts descending.
+    """
+
+    def __init__(self, name, base_query, columns, sorts, default_fields):
+        self.name = name
+        self.base_query = base_query
+        self.columns = columns
+        self.sorts = sorts
+        self.default_sort = next(iter(sorts))
+        self.default_fields = default_fields
+
+    def parse_fields(self, value):
+        if not value:
+            return list(self.default_fields)
+        fields = [field.strip() for field in value.split(',') if field.strip()]
+        unknown = [field for field in fields if field not in self.columns]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}; choose from {', '.join(self.columns)}")
+        return fields
+
+    def parse_sort(self, value):
+        sort = value or self.default_sort
+        if sort.lstrip('-') not in self.sorts:
+            raise ApiError(f"Unknown sort: {sort}; choose from {', '.join(self.sorts)} (prefix - to reverse)")
+        return sort
+
+    def encode_cursor(self, sort, row):
+        payload = [sort] + [_json_value(row[field]) for field in self.sorts[sort.lstrip('-')]]
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, sort, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise ApiError('Invalid cursor')
+        key = self.sorts[sort.lstrip('-')]
+        if not isinstance(payload, list) or len(payload) != len(key) + 1 or payload[0] != sort:
+            raise ApiError('Invalid cursor (it belongs to a different sort)')
+        return [_parse_value(self.columns[field], value) for field, value in zip(key, payload[1:])]
+
+    def page(self, filters=(), fields=None, sort=None, cursor=None, limit=50):
+        """``{'data': [row dicts], 'next_cursor': str or None}`` for one page"""
+        fields = fields or list(self.default_fields)
+        sort = sort or self.default_sort
+        descending = sort.startswith('-')
+        key = self.sorts[sort.lstrip('-')]
+        selected = list(dict.fromkeys(fields + key))
+
+        query = self.base_query(select(*[self.columns[field].label(field) for field in selected]))
+        for condition in filters:
+            query = query.where(condition)
+        key_columns = tuple_(*[self.columns[field] for field in key])
+        if cursor:
+            position = tuple_(*self.decode_cursor(sort, cursor))
+            query = query.where(key_columns < position if descending else key_columns > position)
+        order = [self.columns[field].desc() if descending else self.columns[field] for field in key]
+        # One extra row tells whether there is a next page
+        rows = [dict(row._mapping) for row in db.session.execute(query.order_by(*order).limit(limit + 1))]
+
+        next_cursor = self.encode_cursor(sort, rows[limit - 1]) if len(rows) > limit else None
+        return {
+            'data': [{field: row[field] for field in fields} for row in rows[:limit]],
+            'next_cursor': next_cursor,
+        }
+
+
+def to_json(page):
+    """A ``page()`` result with dates and times as ISO strings"""
+    return {
+        'data': [{field: _json_value(value) for field, value in row.items()} for row in page['data']],
+        'next_cursor': page['next_cursor'],
+    }
+
+
+def _is_booked():
+    return select(Booking.id).where(Booking.slot_id == Slot.id).exists()
+
+
+SLOTS = Listing(
+    'slots',
+    lambda query: query.select_from(Slot),
+    columns={
+        'id': Slot.id,
+        'slot_date': Slot.slot_date,
+        'slot_start_time': Slot.slot_start_time,
+        'slot_end_time': Slot.slot_end_time,
+        'available': Slot.available,
+        'booked': _is_booked(),
+    },
+    sorts={
+        'slot_date': ['slot_date', 'slot_start_time', 'id'],
+        'slot_start_time': ['slot_start_time', 'slot_date', 'id'],
+    },
+    default_fields=['id', 'slot_date', 'slot_start_time', 'slot_end_time', 'available', 'booked'],
+)
+
+BOOKINGS = Listing(
+    'bookings',
+    lambda query: query.select_from(Booking).join(Slot, Booking.slot_id == Slot.id)
+    .outerjoin(User, Booking.user_id == User.id),
+    columns={
+        'id': Booking.id,
+        'slot_id': Booking.slot_id,
+        'slot_date': Slot.slot_date,
+        'slot_start_time': Slot.slot_start_time,
+        'slot_end_time': Slot.slot_end_time,
+        'user_id': Booking.user_id,
+        'username': User.username,
+        'first_name': User.first_name,
+        'last_name': User.last_name,
+        'description': Booking.description,
+        'calendar_status': Booking.calendar_status,
+    },
+    sorts={
+        'slot_date': ['slot_date', 'slot_start_time', 'id'],
+    },
+    default_fields=['id', 'slot_id', 'slot_date', 'slot_start_time', 'slot_end_time', 'user_id', 'username',
+                    'description', 'calendar_status'],
+)
+
+USERS = Listing(
+    'users',
+    lambda query: query.select_from(User),
+    columns={
+        'id': User.id,
+        'username': User.username,
+        'email': User.email,
+        'first_name': User.first_name,
+        'last_name': User.last_name,
+        'role': User.role,
+        'booking_count': select(func.count(Booking.id)).where(Booking.user_id == User.id).scalar_subquery(),
+    },
+    sorts={
+        'username': ['username', 'id'],
+        'id': ['id'],
+    },
+    default_fields=['id', 'username', 'email', 'first_name', 'last_name', 'role'],
+)
+
+
+def slot_filters(args):
+    filters = []
+    if args.get('date'):
+        filters.append(Slot.slot_date == parse_date(args['date'], 'date'))
+    if args.get('date_from'):
+        filters.append(Slot.slot_date >= parse_date(args['date_from'], 'date_from'))
+    if args.get('date_to'):
+        filters.append(Slot.slot_date <= parse_date(args['date_to'], 'date_to'))
+    available = parse_bool(args.get('available'), 'available')
+    if available is not None:
+        filters.append(Slot.available == available)
+    booked = parse_bool(args.get('booked'), 'booked')
+    if booked is not None:
+        filters.append(_is_booked() if booked else ~_is_booked())
+    return filters
+
+
+def booking_filters(args, today):
+    filters = []
+    if args.get('user_id'):
+        try:
+            filters.append(Booking.user_id == int(args['user_id']))
+        except ValueError:
+            raise ApiError('user_id must be an integer')
+    if args.get('date_from'):
+        filters.append(Slot.slot_date >= parse_date(args['date_from'], 'date_from'))
+    if args.get('date_to'):
+        filters.append(Slot.slot_date <= parse_date(args['date_to'], 'date_to'))
+    when = args.get('when')
+    if when == 'upcoming':
+        filters.append(Slot.slot_date >= today)
+    elif when == 'past':
+        filters.append(Slot.slot_date < today)
+    elif when not in (None, '', 'all'):
+        raise ApiError('when must be all, upcoming or past')
+    if args.get('calendar_status'):
+        filters.append(Booking.calendar_status == args['calendar_status'])
+    return filters
+
+
+def user_filters(args):
+    filters = []
+    if args.get('role'):
+        filters.append(User.role == args['role'])
+    q = (args.get('q') or '').strip().lower()
+    if q:
+        # Substring match; the users table is small enough not to need an index for this
+        pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        filters.append(func.lower(User.username).like(pattern, escape='\\')
+                       | func.lower(User.email).like(pattern, escape='\\')
+                       | func.lower(User.first_name + ' ' + User.last_name).like(pattern, escape='\\'))
+    return filters
+
+
+def user_counts():
+    """``{'total', 'admin', 'teacher'}`` user counts in one aggregate query"""
+    counts = dict(db.session.query(User.role, func.count(User.id)).group_by(User.role).all())
+    return {'total': sum(counts.values()), 'admin': counts.get('admin', 0), 'teacher': counts.get('teacher', 0)}
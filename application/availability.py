@@ -0,0 +1,150 @@
+"""
+Slot availability queries for the teacher calendar.
+
+The calendar only needs to know which days in the visible window have a free
+slot, so that is asked as one grouped count per date bounded by the window;
+the slots of a single day are fetched separately when it is opened. Both
+queries are served by ``ix_slot_date_available`` and ``uq_booking_slot_id``.
+
+``AvailabilityCache`` keeps the per-date free-slot counts and per-date slot
+lists in a cache backend (see ``application.cache``). Routes that create,
+delete, toggle or book slots call ``invalidate`` with the dates they touched
+after committing, so only those dates are recomputed. Entries are keyed by
+the date's data version (``application.versions``), which ``invalidate``
+bumps, so a change made through one worker is seen by every worker even
+with the per-process backend; the old entries simply age out.
+
+With a shared backend the versions are also kept there, as counters that
+``invalidate`` increments atomically, so reads do not touch
+``data_version``; a date without a counter (never read, expired or
+evicted) is looked up there once and its counter seeded. The per-process
+backend cannot hold them, as other workers would not see the increments,
+so it reads ``data_version`` on every request.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from application.models import db, Slot
+from application.versions import bump_versions, date_versions
+
+
+def _free_slots():
+    return (Slot.available == True, ~Slot.bookings.any())
+
+
+def free_slot_counts(first_day, last_day):
+    """``{date: free slot count}`` for dates in the window that have free slots"""
+    rows = db.session.query(Slot.slot_date, func.count(Slot.id)).filter(
+        Slot.slot_date >= first_day, Slot.slot_date <= last_day, *_free_slots()
+    ).group_by(Slot.slot_date)
+    return {slot_date: count for slot_date, count in rows}
+
+
+def available_dates(first_day, last_day):
+    """Set of dates between first_day and last_day (inclusive) with a free slot"""
+    return set(free_slot_counts(first_day, last_day))
+
+
+def available_slots_on(slot_date):
+    """Free slots of one day, in start time order"""
+    return Slot.query.filter(Slot.slot_date == slot_date, *_free_slots()) \
+        .order_by(Slot.slot_start_time).all()
+
+
+def _days(first_day, last_day):
+    return [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+
+
+class AvailabilityCache:
+    """Per-date availability served from a cache backend, filled from the DB on miss"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _version_key(day):
+        return f'avail:version:{day.isoformat()}'
+
+    @staticmethod
+    def _count_key(day, version):
+        return f'avail:count:{day.isoformat()}:{version}'
+
+    @staticmethod
+    def _slots_key(day, version):
+        return f'avail:slots:{day.isoformat()}:{version}'
+
+    def versions(self, first_day, last_day):
+        """``{date: data version}`` for every date in the window, zeros included"""
+        days = _days(first_day, last_day)
+        if not self.backend.shared:
+            stored = date_versions(first_day, last_day)
+            return {day: stored.get(day, 0) for day in days}
+        keys = {day: self._version_key(day) for day in days}
+        cached = self.backend.get_many(keys.values())
+        versions = {day: cached[key] for day, key in keys.items() if key in cached}
+
+        missing = [day for day in days if day not in versions]
+        if missing:
+            stored = date_versions(missing[0], missing[-1])
+            fresh = {day: stored.get(day, 0) for day in missing}
+            self.backend.set_many({keys[day]: version for day, version in fresh.items()})
+            versions.update(fresh)
+        return versions
+
+    def version(self, day):
+        return self.versions(day, day)[day]
+
+    def free_slot_counts(self, first_day, last_day):
+        """``{date: count}`` for every date in the window, zeros included"""
+        days = _days(first_day, last_day)
+        versions = self.versions(first_day, last_day)
+        keys = {day: self._count_key(day, versions[day]) for day in days}
+        cached = self.backend.get_many(keys.values())
+        counts = {day: cached[key] for day, key in keys.items() if key in cached}
+
+        missing = [day for day in days if day not in counts]
+        if missing:
+            # One grouped query over the span of the misses
+            found = free_slot_counts(missing[0], missing[-1])
+            fresh = {day: found.get(day, 0) for day in missing}
+            self.backend.set_many({keys[day]: count for day, count in fresh.items()})
+            counts.update(fresh)
+        return counts
+
+    def available_dates(self, first_day, last_day):
+        return {day for day, count in self.free_slot_counts(first_day, last_day).items() if count}
+
+    def available_slots_on(self, slot_date, version=None):
+        """Free slots of one day as dicts with ``id``, ``slot_start_time`` and ``slot_end_time``"""
+        if version is None:
+            version = self.version(slot_date)
+        key = self._slots_key(slot_date, version)
+        slots = self.backend.get(key)
+        if slots is None:
+            slots = [{
+                'id': slot.id,
+                'slot_start_time': str(slot.slot_start_time),
+                'slot_end_time': str(slot.slot_end_time),
+            } for slot in available_slots_on(slot_date)]
+            self.backend.set(key, slots)
+        return slots
+
+    def invalidate(self, dates):
+        """Bump the versions of ``dates``; call after the change is committed"""
+        dates = set(dates)
+        bump_versions(dates)
+        if self.backend.shared and dates:
+            counters = self.backend.incr_many(self._version_key(day) for day in dates)
+            # A counter the increment created starts from 1, not the date's version;
+            # drop it so the next read seeds it from data_version
+            self.backend.delete_many(key for key, value in counters.items() if value == 1)
+
+    def forget_range(self, first_day, last_day):
+        """Drop the version counters of the window, after its data versions were purged"""
+        if self.backend.shared:
+            self.backend.delete_many(self._version_key(day) for day in _days(first_day, last_day))
+
+    def invalidate_range(self, first_day, last_day):
+        self.invalidate(_days(first_day, last_day))
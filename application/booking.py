@@ -0,0 +1,199 @@
+"""
+Slot booking and the booking listings shown on the dashboards.
+
+Whether a slot is free is decided by the database, not by a prior SELECT: the
+booking row is inserted straight away and the ``uq_booking_slot_id`` unique
+constraint rejects every claim but the first, so concurrent requests from
+several gunicorn workers can never double-book a slot.
+
+``claim_slots`` books several slots for one teacher in a single transaction,
+either all-or-nothing or best-effort with a result per slot. Per-teacher
+limits are checked for the whole request with one aggregate query, and again
+after the inserts, with the teacher's row locked, so concurrent requests from
+the same teacher cannot together go over them.
+"""
+
+from collections import Counter
+
+from sqlalchemy import case, distinct, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager, joinedload
+
+from application.models import db, Booking, Slot, User
+
+
+def claim_slot(slot, user_id, description):
+    """Insert a booking of ``slot`` for ``user_id``.
+
+    Returns the flushed ``Booking``, or ``None`` if the slot is unavailable or
+    someone else already holds it (the session is rolled back in that case).
+    The caller commits.
+    """
+    if not slot.available:
+        return None
+    booking = Booking(user_id=user_id, slot_id=slot.id, description=description)
+    db.session.add(booking)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return booking
+
+
+# Per-slot outcomes of claim_slots
+BOOKED = 'booked'
+TAKEN = 'taken'
+UNAVAILABLE = 'unavailable'
+NOT_FOUND = 'not_found'
+LIMIT_REACHED = 'limit_reached'
+NOT_ATTEMPTED = 'not_attempted'
+
+
+def upcoming_booking_counts(user_id, today):
+    """``{date: count}`` of the user's bookings from today on, in one grouped query"""
+    rows = db.session.query(Slot.slot_date, func.count(Booking.id)) \
+        .join(Slot, Booking.slot_id == Slot.id) \
+        .filter(Booking.user_id == user_id, Slot.slot_date >= today) \
+        .group_by(Slot.slot_date)
+    return dict(rows.all())
+
+
+def over_limits(slots, user_id, today, max_upcoming=0, max_per_day=0):
+    """Ids of the slots in ``slots`` that would take the user past a limit (0 means no limit).
+
+    Slots are considered in date/time order, so the earliest ones are the ones
+    that fit. Past slots do not count towards either limit.
+    """
+    if not (max_upcoming or max_per_day):
+        return set()
+    counts = Counter(upcoming_booking_counts(user_id, today))
+    upcoming = sum(counts.values())
+    refused = set()
+    for slot in sorted(slots, key=lambda s: (s.slot_date, s.slot_start_time, s.id)):
+        if slot.slot_date < today:
+            continue
+        if (max_upcoming and upcoming >= max_upcoming) or \
+                (max_per_day and counts[slot.slot_date] >= max_per_day):
+            refused.add(slot.id)
+            continue
+        upcoming += 1
+        counts[slot.slot_date] += 1
+    return refused
+
+
+def lock_user(user_id):
+    """Lock the user's row until commit, serialising their concurrent claims.
+
+    A no-op on SQLite, where the booking insert takes the database write lock.
+    """
+    db.session.query(User.id).filter(User.id == user_id).with_for_update().scalar()
+
+
+def exceeds_limits(user_id, today, dates, max_upcoming=0, max_per_day=0):
+    """Whether the user's bookings, as this transaction sees them, break a limit on any of ``dates``"""
+    dates = {day for day in dates if day >= today}
+    if not dates or not (max_upcoming or max_per_day):
+        return False
+    counts = upcoming_booking_counts(user_id, today)
+    return bool(max_upcoming and sum(counts.values()) > max_upcoming) or \
+        bool(max_per_day and any(counts.get(day, 0) > max_per_day for day in dates))
+
+
+class ClaimConflict(RuntimeError):
+    """Concurrent bookings kept invalidating a claim until its attempts ran out"""
+
+
+def claim_slots(slot_ids, user_id, description, today, atomic=True, limits=None, attempts=3):
+    """Book several slots for ``user_id`` in one transaction.
+
+    Returns ``(results, claimed)``: ``results`` maps every requested slot id
+    to one of the outcome constants above, ``claimed`` lists the flushed
+    ``(Booking, Slot)`` pairs. With ``atomic`` nothing is booked
+    unless every slot can be, and the slots that could have been are reported
+    as ``NOT_ATTEMPTED``. ``limits`` holds ``max_upcoming`` and ``max_per_day``.
+    The caller commits.
+
+    Already booked slots are found with one query up front. A concurrent
+    booking that gets in between shows up as an ``IntegrityError`` on flush,
+    and a concurrent claim by the same user as a limit exceeded after the
+    inserts; in both cases the whole claim is retried against fresh data,
+    and ``ClaimConflict`` is raised once ``attempts`` run out.
+    """
+    slot_ids = list(dict.fromkeys(slot_ids))
+    limits = limits or {}
+    for attempt in range(attempts):
+        if any(limits.values()):
+            lock_user(user_id)
+        slots = {slot.id: slot for slot in Slot.query.filter(Slot.id.in_(slot_ids))}
+        taken = {slot_id for (slot_id,) in db.session.query(Booking.slot_id).filter(Booking.slot_id.in_(slot_ids))}
+        results = {}
+        for slot_id in slot_ids:
+            slot = slots.get(slot_id)
+            if slot is None:
+                results[slot_id] = NOT_FOUND
+            elif slot_id in taken:
+                results[slot_id] = TAKEN
+            elif not slot.available:
+                results[slot_id] = UNAVAILABLE
+        candidates = [slots[slot_id] for slot_id in slot_ids if slot_id not in results]
+        for slot_id in over_limits(candidates, user_id, today, **limits):
+            results[slot_id] = LIMIT_REACHED
+
+        claimable = [slot for slot in candidates if slot.id not in results]
+        if atomic and len(claimable) < len(slot_ids):
+            results.update({slot.id: NOT_ATTEMPTED for slot in claimable})
+            return {slot_id: results[slot_id] for slot_id in slot_ids}, []
+
+        claimed = [(Booking(user_id=user_id, slot_id=slot.id, description=description), slot)
+                   for slot in claimable]
+        db.session.add_all(booking for booking, _ in claimed)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Someone booked one of these slots since they were checked
+            db.session.rollback()
+            continue
+        if exceeds_limits(user_id, today, {slot.slot_date for slot in claimable}, **limits):
+            # Another claim by this user committed since the limits were checked
+            db.session.rollback()
+            continue
+        results.update({slot.id: BOOKED for slot in claimable})
+        return {slot_id: results[slot_id] for slot_id in slot_ids}, claimed
+    raise ClaimConflict(f'Could not claim slots {slot_ids} after {attempts} attempts')
+
+
+BOOKING_FILTERS = ('all', 'upcoming', 'past')
+
+
+def booking_listing(today, user_id=None, booking_filter='all'):
+    """Bookings query for the dashboards, with slot (and user) loaded in the same SELECT.
+
+    ``user_id`` limits it to one teacher's bookings. Upcoming bookings are
+    listed soonest first, past ones most recent first.
+    """
+    query = Booking.query.join(Booking.slot).options(contains_eager(Booking.slot))
+    if user_id is None:
+        query = query.options(joinedload(Booking.user))
+    else:
+        query = query.filter(Booking.user_id == user_id)
+
+    if booking_filter == 'upcoming':
+        query = query.filter(Slot.slot_date >= today)
+    elif booking_filter == 'past':
+        return query.filter(Slot.slot_date < today).order_by(
+            Slot.slot_date.desc(), Slot.slot_start_time.desc(), Booking.id.desc())
+    return query.order_by(Slot.slot_date, Slot.slot_start_time, Booking.id)
+
+
+def booking_stats(today, user_id=None):
+    """Dashboard counters computed in one aggregate query"""
+    query = db.session.query(
+        func.count(Booking.id),
+        func.count(distinct(Booking.user_id)),
+        func.coalesce(func.sum(case((Slot.slot_date >= today, 1), else_=0)), 0),
+    ).join(Slot, Booking.slot_id == Slot.id)
+    if user_id is not None:
+        query = query.filter(Booking.user_id == user_id)
+    total, users, upcoming = query.one()
+    return {'total': total, 'users': users, 'upcoming': upcoming, 'past': total - upcoming}
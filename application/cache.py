@@ -0,0 +1,236 @@
+"""
+Small key/value cache backends shared by the application caches.
+
+All backends expose the same bulk interface (``get_many``, ``set_many``,
+``delete_many``, ``incr_many``, ``clear``) and are selected with a URL;
+``shared`` is true for the Redis backends, whose entries every worker sees:
+
+* ``memory://`` (default): thread-safe in-process LRU with per-entry TTL.
+  Each gunicorn worker has its own copy, so keep TTLs short.
+* ``redis://host:port/db``: shared Redis (requires the ``redis`` package).
+* ``local-redis://``: in-process stand-in with the Redis client interface,
+  for running the Redis code path without a server.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded in-process cache; least recently used entries are evicted first"""
+
+    shared = False
+
+    def __init__(self, maxsize=4096, default_ttl=60):
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def incr_many(self, keys, ttl=None):
+        """Add 1 to each integer entry, starting missing ones at 0; returns ``{key: new value}``"""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        now = time.monotonic()
+        values = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                value = entry[1] + 1 if entry and (entry[0] is None or entry[0] > now) else 1
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+                values[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return values
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """Cache stored in Redis as JSON values under a key prefix"""
+
+    shared = True
+
+    def __init__(self, client, prefix='slotbooking:', default_ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + key for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, mapping, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        pipe = self.client.pipeline()
+        for key, value in mapping.items():
+            pipe.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+        pipe.execute()
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def incr_many(self, keys, ttl=None):
+        """Atomic ``INCR`` of each key (missing ones start at 0); returns ``{key: new value}``"""
+        keys = list(keys)
+        ttl = self.default_ttl if ttl is None else ttl
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.incr(self.prefix + key)
+            if ttl:
+                pipe.expire(self.prefix + key, ttl)
+        results = pipe.execute()
+        return dict(zip(keys, results[::2] if ttl else results))
+
+    def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the redis-py client used above"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def mget(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._live(key, now)
+                values.append(entry[1] if entry else None)
+        return values
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            value = int(entry[1]) + 1 if entry else 1
+            self._data[key] = (entry[0] if entry else None, str(value))
+        return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is None:
+                return False
+            self._data[key] = (time.monotonic() + seconds, entry[1])
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match='*'):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [key for key in self._data if key.startswith(prefix)]
+
+    def pipeline(self):
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    def __init__(self, client):
+        self.client = client
+        self._commands = []
+
+    def set(self, key, value, ex=None):
+        self._commands.append((self.client.set, (key, value), {'ex': ex}))
+        return self
+
+    def incr(self, key):
+        self._commands.append((self.client.incr, (key,), {}))
+        return self
+
+    def expire(self, key, seconds):
+        self._commands.append((self.client.expire, (key, seconds), {}))
+        return self
+
+    def execute(self):
+        results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+def create_cache(url='memory://', maxsize=4096, default_ttl=60, prefix='slotbooking:'):
+    """Build a cache backend from a ``memory://``, ``local-redis://`` or ``redis://`` URL"""
+    url = url or 'memory://'
+    if url.startswith('memory://'):
+        return LRUCache(maxsize=maxsize, default_ttl=default_ttl)
+    if url.startswith('local-redis://'):
+        return RedisCache(LocalRedis(), prefix=prefix, default_ttl=default_ttl)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f'The redis package is required for cache URL {url}')
+        return RedisCache(redis.Redis.from_url(url), prefix=prefix, default_ttl=default_ttl)
+    raise ValueError(f'Unsupported cache URL: {url}')
@@ -0,0 +1,249 @@
+"""
+Process-wide Google Calendar client.
+
+Credentials and the discovery-based service are built once per process, on
+first use, instead of on every booking. The service object is shared between
+threads, but httplib2 connections are not thread-safe, so every thread gets its
+own authorized HTTP transport. Access tokens are refreshed lazily by that
+transport when they expire.
+
+Every call is bounded by ``timeout`` seconds and, when a ``breaker`` is
+given, goes through a circuit breaker: once Google has failed (timed out,
+refused the connection or answered 5xx/429) several times in a row, calls
+fail immediately with ``CircuitOpenError`` and the outbox retries them after
+the circuit closes again.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from application.circuit import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+
+# Calendar API allows up to 50 calls per batch request
+MAX_BATCH_SIZE = 50
+
+
+# Largest page events().list returns
+LIST_PAGE_SIZE = 2500
+
+
+class SyncTokenExpired(Exception):
+    """Google no longer accepts the sync token (410 Gone); a full sync is needed"""
+
+
+def is_outage(exc):
+    """Whether ``exc`` says Google is unreachable or struggling, rather than rejecting one request"""
+    status = getattr(getattr(exc, 'resp', None), 'status', None)
+    return status is None or status >= 500 or status == 429
+
+
+def build_event(slot, metadata, time_zone='Asia/Kolkata'):
+    """Calendar event body for a booking of ``slot``"""
+    start_dt = datetime.combine(slot.slot_date, slot.slot_start_time)
+    end_dt = start_dt + timedelta(hours=1)
+    return {
+        'summary': f'Name-{metadata["full_name"]}, Email-{metadata["email"]}, Description-{metadata["description"]}',
+        'start': {'dateTime': start_dt.isoformat(), 'timeZone': time_zone},
+        'end': {'dateTime': end_dt.isoformat(), 'timeZone': time_zone},
+    }
+
+
+class GoogleCalendarClient:
+    """Thread-safe wrapper around the Calendar v3 ``events`` resource.
+
+    ``http_factory`` returns a fresh httplib2-compatible transport and can be
+    used to inject ``googleapiclient.http.HttpMock`` (or any fake) so the client
+    can be exercised and benchmarked without network access or credentials.
+    """
+
+    def __init__(self, credentials_path, calendar_id, time_zone='Asia/Kolkata',
+                 http_factory=None, timeout=10.0, breaker=None):
+        self.credentials_path = credentials_path
+        self.calendar_id = calendar_id
+        self.time_zone = time_zone
+        self.timeout = timeout
+        self.breaker = breaker
+        self._http_factory = http_factory
+        self._credentials = None
+        self._service = None
+        self._build_lock = threading.Lock()
+        self._local = threading.local()
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        return cls(
+            credentials_path=config['GOOGLE_CREDENTIALS_PATH'],
+            calendar_id=config['GOOGLE_CALENDAR_ID'],
+            time_zone=config.get('CALENDAR_TIME_ZONE', 'Asia/Kolkata'),
+            timeout=config.get('CALENDAR_TIMEOUT_SECONDS', 10.0),
+            breaker=CircuitBreaker(
+                'google_calendar',
+                failure_threshold=config.get('CALENDAR_BREAKER_FAILURES', 5),
+                reset_timeout=config.get('CALENDAR_BREAKER_RESET_SECONDS', 60),
+                is_failure=is_outage,
+            ) if config.get('CALENDAR_BREAKER_FAILURES', 5) else None,
+            **kwargs,
+        )
+
+    def _load_credentials(self):
+        from google.oauth2 import service_account
+        logger.info(f'Loading Google service account credentials from {self.credentials_path}')
+        return service_account.Credentials.from_service_account_file(
+            self.credentials_path, scopes=SCOPES)
+
+    def _new_http(self):
+        if self._http_factory is not None:
+            return self._http_factory()
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        # httplib2 applies one socket timeout to connecting and to every read
+        return AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=self.timeout))
+
+    @property
+    def service(self):
+        """The Calendar service, built on first access and then reused"""
+        if self._service is None:
+            with self._build_lock:
+                if self._service is None:
+                    from googleapiclient.discovery import build
+                    if self._http_factory is None:
+                        self._credentials = self._load_credentials()
+                    # static_discovery uses the discovery document bundled with
+                    # the client library rather than fetching it over the network
+                    self._service = build('calendar', 'v3', http=self._new_http(),
+                                          static_discovery=True, cache_discovery=False)
+                    logger.info('Google Calendar service built')
+        return self._service
+
+    @property
+    def http(self):
+        """The calling thread's transport"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            self.service  # credentials must exist before the first transport
+            http = self._local.http = self._new_http()
+        return http
+
+    def _execute(self, request):
+        """Execute a request or batch on this thread's transport, through the breaker"""
+        if self.breaker is None:
+            return request.execute(http=self.http)
+        return self.breaker.call(request.execute, http=self.http)
+
+    def insert_event(self, event):
+        created_event = self._execute(self.service.events().insert(
+            calendarId=self.calendar_id, body=event))
+        return created_event.get('id') if created_event else None
+
+    def insert_events(self, events, batch_size=MAX_BATCH_SIZE):
+        """Create many events with batched HTTP requests.
+
+        ``events`` maps caller-chosen keys to event bodies. Returns a dict
+        mapping each key to ``(event_id, None)`` on success or
+        ``(None, error message)``; the error is the ``CircuitOpenError``
+        itself for events that were not sent because the circuit is open.
+        """
+        batch_size = min(batch_size, MAX_BATCH_SIZE)
+        results = {}
+
+        def callback(request_id, response, exception):
+            if exception is None and response and response.get('id'):
+                results[request_id] = (response['id'], None)
+            else:
+                results[request_id] = (None, str(exception or 'Calendar API returned no event id'))
+
+        items = list(events.items())
+        for i in range(0, len(items), batch_size):
+            chunk = items[i:i + batch_size]
+            batch = self.service.new_batch_http_request(callback=callback)
+            for key, body in chunk:
+                batch.add(self.service.events().insert(calendarId=self.calendar_id, body=body),
+                          request_id=str(key))
+            try:
+                self._execute(batch)
+            except CircuitOpenError as e:
+                # Nothing in this chunk was sent
+                for key, _ in chunk:
+                    results[str(key)] = (None, e)
+            except Exception as e:
+                logger.warning(f'Calendar batch insert of {len(chunk)} event(s) failed: {e}')
+                for key, _ in chunk:
+                    results.setdefault(str(key), (None, str(e)))
+        return results
+
+    def list_events(self, time_min=None, time_max=None, sync_token=None):
+        """All events of a full or incremental sync, following every page.
+
+        A full sync lists the live events between ``time_min`` and ``time_max``
+        (timezone-aware datetimes). An incremental sync passes the
+        ``sync_token`` of the previous one instead and gets only the events
+        changed since, deleted ones included with status ``cancelled``.
+        Returns ``(events, next_sync_token)``; raises ``SyncTokenExpired``
+        when the token is too old to use.
+        """
+        from googleapiclient.errors import HttpError
+
+        params = {'calendarId': self.calendar_id, 'maxResults': LIST_PAGE_SIZE}
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            params.update(timeMin=time_min.isoformat(), timeMax=time_max.isoformat())
+        events, page_token = [], None
+        while True:
+            try:
+                page = self._execute(self.service.events().list(pageToken=page_token, **params))
+            except HttpError as e:
+                if e.resp.status == 410:
+                    raise SyncTokenExpired(str(e))
+                raise
+            events.extend(page.get('items', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return events, page.get('nextSyncToken')
+
+    def delete_event(self, event_id):
+        self._execute(self.service.events().delete(
+            calendarId=self.calendar_id, eventId=event_id))
+
+    def delete_events(self, event_ids, batch_size=MAX_BATCH_SIZE):
+        """Delete many events with batched HTTP requests.
+
+        Returns a dict mapping each event id to ``None`` on success or an
+        error message (or ``CircuitOpenError``, as for ``insert_events``).
+        Events that are already gone count as deleted.
+        """
+        from googleapiclient.errors import HttpError
+
+        batch_size = min(batch_size, MAX_BATCH_SIZE)
+        results = {}
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = None
+            elif isinstance(exception, HttpError) and exception.resp.status in (404, 410):
+                results[request_id] = None
+            else:
+                results[request_id] = str(exception)
+
+        event_ids = list(dict.fromkeys(event_ids))
+        for i in range(0, len(event_ids), batch_size):
+            chunk = event_ids[i:i + batch_size]
+            batch = self.service.new_batch_http_request(callback=callback)
+            for event_id in chunk:
+                batch.add(self.service.events().delete(calendarId=self.calendar_id, eventId=event_id),
+                          request_id=event_id)
+            try:
+                self._execute(batch)
+            except CircuitOpenError as e:
+                for event_id in chunk:
+                    results[event_id] = e
+            except Exception as e:
+                logger.warning(f'Calendar batch delete of {len(chunk)} event(s) failed: {e}')
+                for event_id in chunk:
+                    results.setdefault(event_id, str(e))
+        return results
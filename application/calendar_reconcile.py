@@ -0,0 +1,254 @@
+"""
+Reconciliation of bookings against the events on the Google Calendar.
+
+The outbox retries calendar writes, but local state and Google can still
+drift apart: a call that timed out may have created its event anyway (and
+its retry a second one), a task can give up after its last attempt, and
+anyone can edit the calendar by hand.
+
+``reconcile_calendar`` lists the calendar's events for the bookable window
+(today and the next ``window_days`` days) and diffs them against the
+window's bookings, indexed in memory by booking id and by event id:
+
+* events the app created (tagged with their booking id, see
+  ``enqueue_event_insert``) whose booking is gone, or that duplicate the
+  event the booking already has, are deleted
+* tagged events that their booking has not recorded yet are adopted
+* bookings whose event has disappeared, or that have no event and nothing
+  queued to create one, get a fresh insert through the outbox
+
+The first run of a day lists the whole window (a full sync) and stores the
+sync token Google returns with it. Later runs send only that token and get
+back the events changed since, so they cost as much as the changes rather
+than the whole calendar. When the window moves on to a new day, Google
+expires the token, or some booking has no event and nothing queued to
+create one, the run does a full sync instead. Events without the
+booking tag (added by hand, or created before the tag existed) are never
+deleted.
+"""
+
+import logging
+import time
+from collections import namedtuple
+from datetime import date, datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import exists
+from sqlalchemy.orm import joinedload
+
+from application.calendar_client import SyncTokenExpired, build_event
+from application.calendar_sync import (
+    ACTION_INSERT, BOOKING_ID_PROPERTY, PENDING, PROCESSING,
+    cancel_pending_inserts, enqueue_event_delete, enqueue_event_insert, flush_deletes,
+)
+from application.models import db, Booking, CalendarOutbox, CalendarSyncState, Slot
+
+logger = logging.getLogger(__name__)
+
+# Keep IN lists well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+BookingRow = namedtuple('BookingRow', 'id event_id')
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _event_date(event):
+    start = event.get('start') or {}
+    value = start.get('dateTime') or start.get('date')
+    return date.fromisoformat(value[:10]) if value else None
+
+
+def _booking_tag(event):
+    value = ((event.get('extendedProperties') or {}).get('private') or {}).get(BOOKING_ID_PROPERTY)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BookingIndex:
+    """Bookings keyed by id and by event id"""
+
+    def __init__(self, rows=()):
+        self.by_id = {}
+        self.by_event = {}
+        # Bookings of the window a full sync listed, whose events it must have seen
+        self.in_window = set()
+        self.add(rows)
+
+    def add(self, rows):
+        for row in rows:
+            row = BookingRow(row.id, row.event_id)
+            self.by_id[row.id] = row
+            if row.event_id:
+                self.by_event[row.event_id] = row
+
+    @classmethod
+    def window(cls, first_day, last_day):
+        index = cls(db.session.query(Booking.id, Booking.event_id).join(Slot, Booking.slot_id == Slot.id)
+                    .filter(Slot.slot_date >= first_day, Slot.slot_date <= last_day))
+        index.in_window = set(index.by_id)
+        return index
+
+    def load(self, booking_ids=(), event_ids=()):
+        """Add the given bookings, wherever their slots are"""
+        for chunk in _chunks(set(booking_ids) - set(self.by_id), CHUNK_SIZE):
+            self.add(db.session.query(Booking.id, Booking.event_id).filter(Booking.id.in_(chunk)))
+        for chunk in _chunks(set(event_ids) - set(self.by_event), CHUNK_SIZE):
+            self.add(db.session.query(Booking.id, Booking.event_id).filter(Booking.event_id.in_(chunk)))
+        return self
+
+
+def _unqueued_bookings(first_day, last_day):
+    """Ids of bookings in the window with no event and no insert on its way"""
+    queued = exists().where(CalendarOutbox.booking_id == Booking.id,
+                            CalendarOutbox.action == ACTION_INSERT,
+                            CalendarOutbox.status.in_((PENDING, PROCESSING)))
+    return {booking_id for (booking_id,) in db.session.query(Booking.id)
+            .join(Slot, Booking.slot_id == Slot.id)
+            .filter(Slot.slot_date >= first_day, Slot.slot_date <= last_day,
+                    Booking.event_id.is_(None), ~queued)}
+
+
+def diff_events(events, index, full, first_day, last_day):
+    """What to repair, given the listed ``events`` and the booking ``index``.
+
+    Returns ``{'delete': {event_id: booking_id}, 'adopt': {booking_id: event_id},
+    'missing': {booking_ids}}``. A booking's recorded event counts as missing
+    when a full sync did not list it or an incremental one listed it as
+    cancelled.
+    """
+    live = {}
+    cancelled = set()
+    for event in events:
+        if event.get('status') == 'cancelled':
+            cancelled.add(event['id'])
+            continue
+        day = _event_date(event)
+        if day is not None and first_day <= day <= last_day:
+            live[event['id']] = event
+
+    def gone(booking):
+        return booking.event_id in cancelled or \
+            (full and booking.id in index.in_window and booking.event_id not in live)
+
+    delete, adopt = {}, {}
+    for event_id, event in live.items():
+        booking_id = _booking_tag(event)
+        if booking_id is None or index.by_event.get(event_id):
+            continue
+        booking = index.by_id.get(booking_id)
+        if booking is None:
+            delete[event_id] = booking_id
+        elif booking_id not in adopt and (booking.event_id is None or gone(booking)):
+            adopt[booking_id] = event_id
+        else:
+            delete[event_id] = booking_id
+
+    missing = {booking.id for booking in index.by_event.values() if gone(booking) and booking.id not in adopt}
+    return {'delete': delete, 'adopt': adopt, 'missing': missing}
+
+
+def _repair(client, plan, time_zone, batch_size):
+    for chunk in _chunks(plan['delete'].items(), batch_size):
+        tasks = [enqueue_event_delete(event_id, booking_id=booking_id, claimed=True)
+                 for event_id, booking_id in chunk]
+        db.session.commit()
+        # Sent as one batch request; failures stay in the outbox for the sync worker
+        flush_deletes(client, tasks, batch_size=batch_size)
+        db.session.commit()
+
+    for chunk in _chunks(plan['adopt'].items(), batch_size):
+        event_ids = dict(chunk)
+        for booking in Booking.query.filter(Booking.id.in_(event_ids)):
+            booking.event_id = event_ids[booking.id]
+            booking.calendar_status = 'synced'
+        # The event exists now; an insert that has not started would duplicate it
+        cancel_pending_inserts(event_ids)
+        db.session.commit()
+
+    for chunk in _chunks(plan['missing'], batch_size):
+        bookings = Booking.query.options(joinedload(Booking.slot), joinedload(Booking.user)) \
+            .filter(Booking.id.in_(chunk))
+        for booking in bookings:
+            if booking.slot is None:
+                logger.warning(f'Booking {booking.id} has no slot; not recreating its calendar event')
+                continue
+            user = booking.user
+            metadata = {
+                'username': user.username if user else '',
+                'email': user.email if user else '',
+                'full_name': f'{user.first_name} {user.last_name}' if user else '',
+                'description': booking.description,
+            }
+            booking.event_id = None
+            enqueue_event_insert(booking, build_event(booking.slot, metadata, time_zone))
+        db.session.commit()
+
+
+def reconcile_calendar(client, calendar_id, today, window_days=120, time_zone='Asia/Kolkata',
+                       batch_size=50, full=False, dry_run=False):
+    """Diff the calendar against the bookings from ``today`` on and repair the differences.
+
+    Returns a report of the sync mode, the events listed and the repairs
+    made (or, with ``dry_run``, that would be made). The caller should wake
+    the calendar sync worker when ``reinserted`` is non-zero.
+    """
+    started = time.perf_counter()
+    first_day, last_day = today, today + timedelta(days=window_days)
+    state = db.session.get(CalendarSyncState, calendar_id) or CalendarSyncState(calendar_id=calendar_id)
+    unqueued = _unqueued_bookings(first_day, last_day)
+    # A booking without an event may still have one from a timed-out insert, which
+    # only a full listing can find; without the check its re-insert would duplicate it
+    incremental = not full and not unqueued and bool(state.sync_token) and \
+        (state.window_start, state.window_end) == (first_day, last_day)
+
+    events = None
+    if incremental:
+        try:
+            events, sync_token = client.list_events(sync_token=state.sync_token)
+        except SyncTokenExpired:
+            logger.info(f'Calendar sync token for {calendar_id} expired; running a full sync')
+            incremental = False
+    if incremental:
+        index = BookingIndex()
+    else:
+        # Indexed before listing: any event a booking records here was created
+        # before the listing started, so a full sync that misses it means it is gone
+        index = BookingIndex.window(first_day, last_day)
+        zone = ZoneInfo(time_zone)
+        events, sync_token = client.list_events(
+            time_min=datetime.combine(first_day, dt_time.min, tzinfo=zone),
+            time_max=datetime.combine(last_day + timedelta(days=1), dt_time.min, tzinfo=zone),
+        )
+    # Looked up after listing, so bookings made while it ran are not mistaken for gone
+    index.load(booking_ids=filter(None, map(_booking_tag, events)), event_ids=[event['id'] for event in events])
+
+    plan = diff_events(events, index, not incremental, first_day, last_day)
+    plan['missing'] |= unqueued - set(plan['adopt'])
+    report = {
+        'mode': 'incremental' if incremental else 'full',
+        'events_listed': len(events),
+        'bookings_indexed': len(index.by_id),
+        'deleted': len(plan['delete']),
+        'adopted': len(plan['adopt']),
+        'reinserted': len(plan['missing']),
+        'dry_run': dry_run,
+    }
+    if not dry_run:
+        _repair(client, plan, time_zone, batch_size)
+        now = datetime.utcnow()
+        state.sync_token = sync_token
+        state.window_start, state.window_end = first_day, last_day
+        state.synced_at = now
+        if not incremental:
+            state.full_synced_at = now
+        db.session.add(state)
+        db.session.commit()
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,456 @@
+"""
+Durable outbox for Google Calendar writes.
+
+Booking routes only record the calendar work they need in ``calendar_outbox``,
+inside the same transaction as the booking itself. ``CalendarSyncWorker`` drains
+the outbox in a background thread, retrying failed calls with exponential
+backoff, so a slow or unavailable Calendar API never holds up a request.
+
+While the Calendar client's circuit breaker is open, tasks are put back
+without using up an attempt and picked up again once it may have closed.
+With ``CALENDAR_SYNC_CONCURRENCY`` above 1 the worker makes the API calls of
+a pass on a thread pool instead of one after another; the database is only
+ever touched from the worker thread.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, update
+
+from application.circuit import CircuitOpenError
+from application.models import db, Booking, CalendarOutbox
+
+logger = logging.getLogger(__name__)
+
+ACTION_INSERT = 'insert'
+ACTION_DELETE = 'delete'
+
+# Private extended property carrying the booking id of every event the app creates
+BOOKING_ID_PROPERTY = 'booking_id'
+
+# Outbox task states
+PENDING = 'pending'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+def enqueue_event_insert(booking, event):
+    """Queue creation of ``event`` for ``booking``; the caller commits.
+
+    The event is tagged with the booking id (a private extended property) so
+    that reconciliation can tell the app's events apart and match them up.
+    """
+    booking.calendar_status = PENDING
+    event = dict(event, extendedProperties={'private': {BOOKING_ID_PROPERTY: str(booking.id)}})
+    task = CalendarOutbox(booking_id=booking.id, action=ACTION_INSERT, payload=json.dumps(event))
+    db.session.add(task)
+    return task
+
+
+def enqueue_event_delete(event_id, booking_id=None, claimed=False):
+    """Queue removal of an existing calendar event; the caller commits.
+
+    ``claimed`` tasks start out leased to the caller (see ``flush_deletes``) so
+    the background worker leaves them alone unless the caller dies.
+    """
+    task = CalendarOutbox(booking_id=booking_id, action=ACTION_DELETE, event_id=event_id)
+    if claimed:
+        task.status = PROCESSING
+        task.locked_at = datetime.utcnow()
+    db.session.add(task)
+    return task
+
+
+def cancel_pending_inserts(booking_ids):
+    """Drop inserts that have not been picked up yet for bookings that are going away"""
+    booking_ids = list(booking_ids)
+    if not booking_ids:
+        return 0
+    result = db.session.execute(
+        update(CalendarOutbox)
+        .where(CalendarOutbox.booking_id.in_(booking_ids),
+               CalendarOutbox.action == ACTION_INSERT,
+               CalendarOutbox.status == PENDING)
+        .values(status=CANCELLED)
+    )
+    return result.rowcount
+
+
+def _retry_delay(attempts, backoff_seconds, max_backoff_seconds):
+    """Seconds to wait before the next try of a task that has failed ``attempts`` times"""
+    return min(backoff_seconds * 2 ** (attempts - 1), max_backoff_seconds)
+
+
+def flush_deletes(client, tasks, batch_size=50, max_attempts=8, backoff_seconds=30, max_backoff_seconds=3600):
+    """Send claimed delete tasks to the Calendar API in batches right away.
+
+    Successful tasks are marked done; failures go back to the outbox for the
+    background worker to retry, with the same backoff as ``process_outbox``
+    (an open circuit defers them without using up an attempt). Returns
+    ``{event_id: error or None}``; the caller commits.
+    """
+    if not tasks:
+        return {}
+    try:
+        results = client.delete_events([task.event_id for task in tasks], batch_size=batch_size)
+    except Exception as e:
+        # Keep the exception itself so an open circuit is told apart below
+        results = {task.event_id: e for task in tasks}
+    now = datetime.utcnow()
+    for task in tasks:
+        error = results.get(task.event_id, 'No response from Calendar API')
+        task.locked_at = None
+        if error is None:
+            task.status = DONE
+        elif isinstance(error, CircuitOpenError):
+            task.status = PENDING
+            task.last_error = str(error)
+            task.next_attempt_at = now + timedelta(seconds=error.retry_after)
+        else:
+            task.attempts += 1
+            task.last_error = str(error)
+            if task.attempts >= max_attempts:
+                task.status = FAILED
+                logger.error(f'Calendar delete for outbox task {task.id} failed permanently: {error}',
+                             extra={'outbox_id': task.id, 'booking_id': task.booking_id, 'attempts': task.attempts})
+            else:
+                task.status = PENDING
+                task.next_attempt_at = now + timedelta(
+                    seconds=_retry_delay(task.attempts, backoff_seconds, max_backoff_seconds))
+        results[task.event_id] = None if error is None else str(error)
+    return results
+
+
+def _due_filter(now, lease_seconds):
+    # Tasks stuck in PROCESSING past their lease belong to a worker that died
+    return or_(
+        and_(CalendarOutbox.status == PENDING, CalendarOutbox.next_attempt_at <= now),
+        and_(CalendarOutbox.status == PROCESSING,
+             CalendarOutbox.locked_at < now - timedelta(seconds=lease_seconds)),
+    )
+
+
+def _claim(task_id, now, lease_seconds):
+    """Atomically move a task to PROCESSING; False if another worker got it first"""
+    result = db.session.execute(
+        update(CalendarOutbox)
+        .where(CalendarOutbox.id == task_id, _due_filter(now, lease_seconds))
+        .values(status=PROCESSING, locked_at=now)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _record_insert(task, event_id):
+    if not event_id:
+        raise RuntimeError('Calendar API returned no event id')
+    task.event_id = event_id
+    booking = db.session.get(Booking, task.booking_id)
+    if booking is None:
+        # Booking was cancelled while the insert was in flight
+        enqueue_event_delete(event_id, booking_id=task.booking_id)
+    else:
+        booking.event_id = event_id
+        booking.calendar_status = 'synced'
+
+
+def _batch_inserts(tasks, client):
+    """Send the insert tasks among ``tasks`` in one batched call.
+
+    Returns ``{task_id: (event_id, exception)}``; empty when there is nothing
+    to batch or the client cannot batch, in which case tasks go one by one.
+    """
+    inserts = [task for task in tasks if task.action == ACTION_INSERT]
+    if len(inserts) < 2 or not hasattr(client, 'insert_events'):
+        return {}
+    try:
+        results = client.insert_events({str(task.id): json.loads(task.payload) for task in inserts})
+    except Exception as e:
+        return {task.id: (None, e) for task in inserts}
+    outcomes = {}
+    for task in inserts:
+        event_id, error = results.get(str(task.id), (None, 'No response from Calendar API'))
+        if error is not None and not isinstance(error, Exception):
+            error = RuntimeError(error)
+        outcomes[task.id] = (event_id, error)
+    return outcomes
+
+
+def _call(client, action, payload, event_id):
+    """One task's Calendar API call; safe on any thread as it never touches the session"""
+    if action == ACTION_INSERT:
+        return client.insert_event(json.loads(payload))
+    if action == ACTION_DELETE:
+        client.delete_event(event_id)
+        return event_id
+    raise ValueError(f'Unknown calendar outbox action: {action}')
+
+
+def _call_each(tasks, client, executor=None):
+    """``{task_id: (result, exception)}`` for ``tasks``, called concurrently on ``executor`` if given"""
+    def attempt(call):
+        task_id, args = call
+        try:
+            return task_id, (_call(client, *args), None)
+        except Exception as e:
+            return task_id, (None, e)
+
+    calls = [(task.id, (task.action, task.payload, task.event_id)) for task in tasks]
+    if executor is not None and len(calls) > 1:
+        return dict(executor.map(attempt, calls))
+    return dict(map(attempt, calls))
+
+
+def process_outbox(client, batch_size=20, max_attempts=8, backoff_seconds=30,
+                   max_backoff_seconds=3600, lease_seconds=300, executor=None):
+    """Push up to ``batch_size`` due outbox tasks to ``client``.
+
+    ``client`` only needs ``insert_event(body) -> event_id`` and
+    ``delete_event(event_id)``; if it also has ``insert_events`` the due
+    inserts are sent in one batch. The other calls run on ``executor`` when
+    one is given. Returns counts of done, retried, failed and deferred
+    (circuit open) tasks.
+    """
+    now = datetime.utcnow()
+    stats = {'done': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+
+    task_ids = [row[0] for row in db.session.query(CalendarOutbox.id)
+                .filter(_due_filter(now, lease_seconds))
+                .order_by(CalendarOutbox.id)
+                .limit(batch_size)]
+
+    claimed = [task_id for task_id in task_ids if _claim(task_id, now, lease_seconds)]
+    tasks = [db.session.get(CalendarOutbox, task_id) for task_id in claimed]
+    # Inserts go to the API as one batch request; deletes and lone inserts one call each
+    outcomes = _batch_inserts(tasks, client)
+    outcomes.update(_call_each([task for task in tasks if task.id not in outcomes], client, executor))
+
+    for task_id in claimed:
+        task = db.session.get(CalendarOutbox, task_id)
+        try:
+            result, error = outcomes[task_id]
+            if error is not None:
+                raise error
+            if task.action == ACTION_INSERT:
+                _record_insert(task, result)
+            task.status = DONE
+            task.last_error = None
+            stats['done'] += 1
+            logger.debug(f'Calendar {task.action} for outbox task {task.id} done',
+                         extra={'outbox_id': task.id, 'booking_id': task.booking_id, 'event_id': task.event_id})
+        except Exception as e:
+            db.session.rollback()
+            task = db.session.get(CalendarOutbox, task_id)
+            task.last_error = str(e)
+            if isinstance(e, CircuitOpenError):
+                # Google is known to be failing: wait for the circuit without using up an attempt
+                task.status = PENDING
+                task.next_attempt_at = datetime.utcnow() + timedelta(seconds=e.retry_after)
+                stats['deferred'] += 1
+            elif task.attempts + 1 >= max_attempts:
+                task.attempts += 1
+                task.status = FAILED
+                if task.action == ACTION_INSERT:
+                    booking = db.session.get(Booking, task.booking_id)
+                    if booking is not None:
+                        booking.calendar_status = FAILED
+                stats['failed'] += 1
+                logger.error(f'Calendar {task.action} for outbox task {task.id} failed permanently: {e}',
+                             extra={'outbox_id': task.id, 'booking_id': task.booking_id, 'attempts': task.attempts})
+            else:
+                task.attempts += 1
+                delay = _retry_delay(task.attempts, backoff_seconds, max_backoff_seconds)
+                task.status = PENDING
+                task.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+                stats['retried'] += 1
+                logger.warning(f'Calendar {task.action} for outbox task {task.id} failed, retrying in {delay}s: {e}',
+                               extra={'outbox_id': task.id, 'booking_id': task.booking_id, 'attempts': task.attempts})
+        task.locked_at = None
+        db.session.commit()
+
+    return stats
+
+
+class CalendarSyncWorker:
+    """Background thread that drains the calendar outbox.
+
+    The thread sleeps for ``interval`` seconds between passes and can be woken
+    early with ``notify()`` right after a booking commits. With
+    ``concurrency`` above 1 the API calls of a pass run on that many threads.
+    """
+
+    def __init__(self, app, client, interval=5.0, concurrency=1):
+        self.app = app
+        self.client = client
+        self.interval = interval
+        self.concurrency = concurrency
+        self._executor = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running or not self.app.config.get('CALENDAR_SYNC_ENABLED', True):
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='calendar-sync', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def executor(self):
+        if self.concurrency > 1 and self._executor is None:
+            self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='calendar-call')
+        return self._executor
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                return process_outbox(
+                    self.client,
+                    batch_size=self.app.config.get('CALENDAR_SYNC_BATCH_SIZE', 20),
+                    max_attempts=self.app.config.get('CALENDAR_SYNC_MAX_ATTEMPTS', 8),
+                    backoff_seconds=self.app.config.get('CALENDAR_SYNC_BACKOFF_SECONDS', 30),
+                    executor=self.executor,
+                )
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Calendar sync pass failed: {e}')
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            stats = self.run_once()
+            # Keep draining while there is a backlog instead of sleeping; deferred
+            # tasks are not due again until the circuit may have closed
+            handled = stats['done'] + stats['retried'] + stats['failed'] if stats else 0
+            if handled >= self.app.config.get('CALENDAR_SYNC_BATCH_SIZE', 20):
+                continue
+            self._wakeup.wait(self.interval)
+
+
+class FakeCalendarClient:
+    """In-memory stand-in for the Google Calendar client, for local runs and tests.
+
+    ``latency`` seconds are slept per API call (outside the lock) to mimic
+    the round trip to Google.
+    """
+
+    def __init__(self, fail_times=0, latency=0.0):
+        self.events = {}
+        self.fail_times = fail_times
+        self.latency = latency
+        self._lock = threading.Lock()
+        # Change sequence number of every event ever touched, for list_events sync tokens
+        self._changed = {}
+        self._sequence = 0
+
+    def _touch(self, event_id):
+        self._sequence += 1
+        self._changed[event_id] = self._sequence
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(latency=config['CALENDAR_FAKE_LATENCY_MS'] / 1000)
+
+    def _maybe_fail(self):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError('Simulated Calendar API failure')
+
+    def insert_event(self, body):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._maybe_fail()
+            event_id = uuid.uuid4().hex
+            self.events[event_id] = body
+            self._touch(event_id)
+            return event_id
+
+    def insert_events(self, events, batch_size=50):
+        if self.latency:
+            # One round trip per batch, like the real client
+            time.sleep(self.latency * math.ceil(len(events) / batch_size))
+        results = {}
+        for key, body in events.items():
+            try:
+                with self._lock:
+                    self._maybe_fail()
+                    event_id = uuid.uuid4().hex
+                    self.events[event_id] = body
+                    self._touch(event_id)
+                results[str(key)] = (event_id, None)
+            except Exception as e:
+                results[str(key)] = (None, str(e))
+        return results
+
+    def _delete(self, event_id):
+        with self._lock:
+            self._maybe_fail()
+            if self.events.pop(event_id, None) is not None:
+                self._touch(event_id)
+
+    def list_events(self, time_min=None, time_max=None, sync_token=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self._maybe_fail()
+            if sync_token:
+                since = int(sync_token)
+                ids = [event_id for event_id, sequence in self._changed.items() if sequence > since]
+            else:
+                # Naive comparison of local times is close enough for a stand-in
+                low, high = time_min.isoformat()[:19], time_max.isoformat()[:19]
+                ids = [event_id for event_id, body in self.events.items()
+                       if low <= body.get('start', {}).get('dateTime', '')[:19] < high]
+            events = [dict(self.events[event_id], id=event_id, status='confirmed') if event_id in self.events
+                      else {'id': event_id, 'status': 'cancelled'} for event_id in ids]
+            return events, str(self._sequence)
+
+    def delete_event(self, event_id):
+        if self.latency:
+            time.sleep(self.latency)
+        self._delete(event_id)
+
+    def delete_events(self, event_ids, batch_size=50):
+        if self.latency:
+            # One round trip per batch, like the real client
+            time.sleep(self.latency * math.ceil(len(event_ids) / batch_size))
+        results = {}
+        for event_id in event_ids:
+            try:
+                self._delete(event_id)
+                results[event_id] = None
+            except Exception as e:
+                results[event_id] = str(e)
+        return results
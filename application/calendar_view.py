@@ -0,0 +1,55 @@
+"""
+Month grids for the teacher booking calendar.
+
+The layout of a month (its title, the blank cells that make weeks start on
+Sunday, and the ISO date and day number of each day) is the same for every
+user all year, so each year's twelve grids are built once and kept for the
+life of the worker. A request only overlays the set of dates that have free
+slots, one month at a time.
+"""
+
+from calendar import monthrange
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+Month = namedtuple('Month', 'key title first_day last_day leading_blanks days prev_key next_key')
+
+
+def month_key(year, month):
+    return f'{year:04d}-{month:02d}'
+
+
+@lru_cache(maxsize=2)
+def year_grid(year):
+    """The twelve ``Month`` grids of ``year``; prev/next keys stay inside the year"""
+    months = []
+    for month in range(1, 13):
+        first_day = date(year, month, 1)
+        last_day = first_day.replace(day=monthrange(year, month)[1])
+        months.append(Month(
+            key=month_key(year, month),
+            title=first_day.strftime('%B %Y'),
+            first_day=first_day,
+            last_day=last_day,
+            leading_blanks=(first_day.weekday() + 1) % 7,
+            days=tuple((first_day.replace(day=day).isoformat(), day) for day in range(1, last_day.day + 1)),
+            prev_key=month_key(year, month - 1) if month > 1 else None,
+            next_key=month_key(year, month + 1) if month < 12 else None,
+        ))
+    return tuple(months)
+
+
+def month_grid(year, month):
+    return year_grid(year)[month - 1]
+
+
+def parse_month(value, year):
+    """Month number from a ``YYYY-MM`` string, or None unless it falls in ``year``"""
+    try:
+        parsed_year, parsed_month = (int(part) for part in (value or '').split('-'))
+    except ValueError:
+        return None
+    if parsed_year != year or not 1 <= parsed_month <= 12:
+        return None
+    return parsed_month
@@ -0,0 +1,95 @@
+"""
+Circuit breaker for calls to an external service.
+
+After ``failure_threshold`` consecutive failures the circuit opens and every
+call fails at once with ``CircuitOpenError`` for ``reset_timeout`` seconds,
+instead of each one waiting out a timeout against a service that is down.
+The first call after that is let through as a trial (half-open): if it
+succeeds the circuit closes, if it fails the circuit opens again.
+
+Only exceptions for which ``is_failure`` returns true count against the
+service; a 404 from a healthy API, for example, proves it is up.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} circuit is open; not calling it for another {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Thread-safe consecutive-failure circuit breaker"""
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, is_failure=None, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure or (lambda exc: True)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() >= self._opened_at + self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def before_call(self):
+        """Raise ``CircuitOpenError`` unless a call may go through now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = self._clock()
+            if self._state == OPEN and now >= self._opened_at + self.reset_timeout:
+                # Let exactly one trial call through
+                self._state = HALF_OPEN
+                return
+            retry_after = max(self._opened_at + self.reset_timeout - now, 1.0)
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info(f'{self.name} circuit closed')
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(f'{self.name} circuit opened after {self._failures} consecutive failure(s); '
+                                   f'failing fast for {self.reset_timeout:.0f}s')
+                self._state = OPEN
+                self._opened_at = self._clock()
+
+    def call(self, func, *args, **kwargs):
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,69 @@
+"""
+Engine settings per database backend and the checks behind ``/healthz``.
+
+Postgres gets an explicitly sized connection pool, pre-ping, connection
+recycling and a server-side ``statement_timeout``. SQLite (development) gets
+WAL journaling and a busy timeout so concurrent bookings wait for the write
+lock instead of failing with "database is locked".
+"""
+
+import time
+
+from sqlalchemy import event, text
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def engine_options(config):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for the configured database"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if is_sqlite(uri):
+        # Seconds the sqlite3 driver waits for a lock before raising
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    if uri.startswith('postgres') and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def configure_sqlite(engine, config):
+    """Set WAL journaling and the busy timeout on every new SQLite connection"""
+    if engine.dialect.name != 'sqlite':
+        return
+    in_memory = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        if config['SQLITE_WAL'] and not in_memory:
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA synchronous = NORMAL')
+        cursor.close()
+
+
+def pool_status(engine):
+    """Connection counts of the engine's pool, where the pool keeps them"""
+    pool = engine.pool
+    status = {'class': type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
+
+
+def ping(engine):
+    """Run ``SELECT 1``; returns the round trip in milliseconds"""
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+    return round((time.perf_counter() - started) * 1000, 2)
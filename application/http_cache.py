@@ -0,0 +1,90 @@
+"""
+HTTP caching: ETags for data-versioned pages and fingerprinted static files.
+
+Slot listings are tagged with a strong ETag built from the data versions
+they were rendered from (``application.versions``), the kind of response,
+the logged-in user and a deploy salt, so a browser revalidating an
+unchanged listing gets a ``304 Not Modified`` without the page being
+queried or rendered. They are sent with ``Cache-Control: private,
+no-cache`` so that every use is revalidated. A response that has flashed
+messages to show is always rendered and sent untagged, so the messages are
+neither lost to a ``304`` nor kept in a cached page.
+
+``StaticFingerprints`` adds a content hash (``?v=...``) to every
+``url_for('static', ...)`` URL. Requests carrying the current hash are
+served with a year-long immutable ``Cache-Control``; changing a file
+changes its URL.
+"""
+
+import hashlib
+import os
+
+from flask import make_response, request, session
+from flask_login import current_user
+
+
+def make_etag(kind, *parts, salt=''):
+    # Pages differ per user (navigation, role), so one user's tag never matches another's page
+    parts = (salt, kind, current_user.get_id()) + parts
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def conditional_response(etag, render):
+    """``304`` if the client already holds ``etag``, otherwise ``render()`` tagged with it"""
+    if session.get('_flashes'):
+        # Flashed messages are shown once, by this render
+        response = make_response(render())
+    elif etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+    else:
+        response = make_response(render())
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    # The same URL renders a full page or an AJAX fragment
+    response.vary.add('X-Requested-With')
+    return response
+
+
+class StaticFingerprints:
+    """Content hashes for static files, added to their URLs as ``v``"""
+
+    def __init__(self, app=None, max_age=31536000):
+        self.max_age = max_age
+        self._hashes = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        app.url_defaults(self._add_fingerprint)
+        app.after_request(self._cache_headers)
+
+    def fingerprint(self, filename):
+        """Short content hash of a static file, recomputed when its mtime changes"""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._hashes.get(filename)
+        if cached is None or cached[0] != mtime:
+            with open(path, 'rb') as f:
+                cached = (mtime, hashlib.md5(f.read()).hexdigest()[:12])
+            self._hashes[filename] = cached
+        return cached[1]
+
+    def _add_fingerprint(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = self.fingerprint(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    def _cache_headers(self, response):
+        if request.endpoint == 'static' and response.status_code == 200 and request.args.get('v') and \
+                request.args['v'] == self.fingerprint(request.view_args['filename']):
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
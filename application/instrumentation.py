@@ -0,0 +1,212 @@
+"""
+Per-request performance instrumentation.
+
+``RequestMetrics`` hooks Flask's request callbacks and the SQLAlchemy engine's
+cursor events. For every request it measures the wall time, the time spent
+in SQL and the number of statements, and the time spent calling external
+services (Google Calendar) through clients wrapped with
+``instrument_client``. Each request is logged as one line; requests and
+statements over the configured thresholds are logged as warnings (slow
+statements with their SQL). The measurements are passed as ``extra`` fields,
+so they become keys of the JSON log lines (see ``application.logs``).
+
+Totals per endpoint are kept in memory and rendered in the Prometheus text
+format by ``render_prometheus``. They are per process, so with several
+gunicorn workers each scrape sees the worker that served it.
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class RequestMetrics:
+    """Collects request, SQL and external call timings for one Flask app"""
+
+    def __init__(self, app=None, engine=None):
+        self._lock = threading.Lock()
+        self._requests = defaultdict(int)
+        self._endpoints = defaultdict(lambda: {
+            'count': 0, 'seconds': 0.0, 'db_seconds': 0.0, 'statements': 0, 'external_seconds': 0.0,
+            'buckets': [0] * len(DURATION_BUCKETS),
+        })
+        self._external = defaultdict(lambda: {'count': 0, 'errors': 0, 'seconds': 0.0})
+        if app is not None:
+            self.init_app(app, engine)
+
+    def init_app(self, app, engine):
+        self.logger = app.logger.getChild('metrics')
+        self.log_requests = app.config['METRICS_LOG_REQUESTS']
+        self.response_headers = app.config['METRICS_RESPONSE_HEADERS']
+        self.slow_request_seconds = app.config['SLOW_REQUEST_MS'] / 1000
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    # Flask hooks
+
+    def _before_request(self):
+        g.metrics = {'started': time.perf_counter(), 'db_seconds': 0.0, 'statements': 0, 'external_seconds': 0.0}
+
+    def _after_request(self, response):
+        metrics = g.pop('metrics', None)
+        if metrics is None:
+            return response
+        seconds = time.perf_counter() - metrics['started']
+        endpoint = request.endpoint or 'unmatched'
+
+        with self._lock:
+            self._requests[(endpoint, request.method, response.status_code)] += 1
+            totals = self._endpoints[endpoint]
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            totals['db_seconds'] += metrics['db_seconds']
+            totals['statements'] += metrics['statements']
+            totals['external_seconds'] += metrics['external_seconds']
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    totals['buckets'][i] += 1
+
+        record = {
+            'event': 'request',
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(seconds * 1000, 2),
+            'db_ms': round(metrics['db_seconds'] * 1000, 2),
+            'sql_statements': metrics['statements'],
+            'external_ms': round(metrics['external_seconds'] * 1000, 2),
+        }
+        if self.response_headers:
+            response.headers['Server-Timing'] = (
+                f"app;dur={record['duration_ms']}, db;dur={record['db_ms']}, external;dur={record['external_ms']}"
+            )
+            response.headers['X-SQL-Statements'] = str(metrics['statements'])
+
+        message = f"{request.method} {request.path} {response.status_code} {record['duration_ms']}ms"
+        if seconds > self.slow_request_seconds:
+            self.logger.warning(f'Slow request {message}', extra={**record, 'event': 'slow_request'})
+        elif self.log_requests and endpoint != 'static':
+            self.logger.info(message, extra=record)
+        return response
+
+    # SQLAlchemy engine events
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info['query_started'].pop()
+        in_request = has_request_context() and 'metrics' in g
+        if in_request:
+            g.metrics['db_seconds'] += seconds
+            g.metrics['statements'] += 1
+        if seconds > self.slow_query_seconds:
+            self.logger.warning(f'Slow query {seconds * 1000:.1f}ms', extra={
+                'event': 'slow_query',
+                'endpoint': request.endpoint if in_request else None,
+                'duration_ms': round(seconds * 1000, 2),
+                'executemany': executemany,
+                'sql': ' '.join(statement.split()),
+            })
+
+    def _handle_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        # so the next statement on this connection is not timed from it
+        conn = exception_context.connection
+        if conn is not None and exception_context.statement is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+    # External services
+
+    def record_external(self, service, operation, seconds, failed=False):
+        with self._lock:
+            totals = self._external[(service, operation)]
+            totals['count'] += 1
+            totals['errors'] += int(failed)
+            totals['seconds'] += seconds
+        if has_request_context() and 'metrics' in g:
+            g.metrics['external_seconds'] += seconds
+
+    def instrument_client(self, client, service, operations):
+        """Time calls to ``operations`` on ``client`` (wraps the bound methods in place)"""
+        for operation in operations:
+            method = getattr(client, operation)
+
+            @functools.wraps(method)
+            def timed(*args, _method=method, _operation=operation, **kwargs):
+                started = time.perf_counter()
+                failed = True
+                try:
+                    result = _method(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    self.record_external(service, _operation, time.perf_counter() - started, failed)
+
+            setattr(client, operation, timed)
+        return client
+
+    # Prometheus exposition
+
+    def render_prometheus(self):
+        with self._lock:
+            requests = dict(self._requests)
+            endpoints = {name: {**totals, 'buckets': list(totals['buckets'])}
+                         for name, totals in self._endpoints.items()}
+            external = {key: dict(totals) for key, totals in self._external.items()}
+
+        lines = ['# HELP http_requests_total Requests served, by endpoint, method and status.',
+                 '# TYPE http_requests_total counter']
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        lines += ['# HELP http_request_duration_seconds Request wall time.',
+                  '# TYPE http_request_duration_seconds histogram']
+        for endpoint, totals in sorted(endpoints.items()):
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le="+Inf")} '
+                         f'{totals["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {totals["seconds"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{_labels(endpoint=endpoint)} {totals["count"]}')
+
+        for name, key, help_text in (
+            ('http_request_db_seconds_total', 'db_seconds', 'Time spent executing SQL during requests.'),
+            ('http_request_sql_statements_total', 'statements', 'SQL statements executed during requests.'),
+            ('http_request_external_seconds_total', 'external_seconds',
+             'Time spent calling external services during requests.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for endpoint, totals in sorted(endpoints.items()):
+                lines.append(f'{name}{_labels(endpoint=endpoint)} {totals[key]:.6g}')
+
+        lines += ['# HELP external_calls_total Calls to external services, including background workers.',
+                  '# TYPE external_calls_total counter']
+        for (service, operation), totals in sorted(external.items()):
+            lines.append(f'external_calls_total{_labels(service=service, operation=operation)} {totals["count"]}')
+        lines += ['# HELP external_call_errors_total External calls that raised.',
+                  '# TYPE external_call_errors_total counter']
+        for (service, operation), totals in sorted(external.items()):
+            lines.append(f'external_call_errors_total{_labels(service=service, operation=operation)} '
+                         f'{totals["errors"]}')
+        lines += ['# HELP external_call_seconds_total Time spent in external calls.',
+                  '# TYPE external_call_seconds_total counter']
+        for (service, operation), totals in sorted(external.items()):
+            lines.append(f'external_call_seconds_total{_labels(service=service, operation=operation)} '
+                         f'{totals["seconds"]:.6f}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+"""
+Non-blocking, structured application logging.
+
+Request threads only put records on an in-memory queue (``QueueHandler``); a
+``QueueListener`` thread formats them as JSON lines and writes them to the
+rotating log file, so file I/O and rotation never happen on a request.
+
+Fields passed with ``extra=`` (``booking_id``, ``slot_id``, ...) become keys
+of the JSON object. Records below WARNING from high-volume loggers (the
+per-request metrics lines, booking events) can be sampled with
+``LOG_SAMPLE_RATE`` when traffic is heavy.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Attributes every LogRecord has; anything else on a record came from ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        entry['location'] = f'{record.pathname}:{record.lineno}'
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a ``rate`` fraction of records below WARNING from the given loggers"""
+
+    def __init__(self, rate=1.0, loggers=()):
+        super().__init__()
+        self.rate = rate
+        self.loggers = tuple(loggers)
+
+    def filter(self, record):
+        if self.rate >= 1 or record.levelno >= logging.WARNING:
+            return True
+        if not record.name.startswith(self.loggers):
+            return True
+        return random.random() < self.rate
+
+
+def _stop_listener(listener):
+    # QueueListener.stop() fails if the listener was already stopped
+    if listener._thread is not None:
+        listener.stop()
+
+
+def setup_logging(app, path='logs/slot_booking.log', use_queue=True):
+    """Send ``app.logger`` and the ``application`` package loggers to a rotating JSON log.
+
+    Returns the started ``QueueListener`` (stopped at exit), or ``None`` when
+    ``use_queue`` is false and the file is written from the calling thread.
+    """
+    file_handler = RotatingFileHandler(path, maxBytes=10240000, backupCount=10)
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.setLevel(logging.INFO)
+
+    listener = None
+    handler = file_handler
+    if use_queue:
+        handler = QueueHandler(queue.SimpleQueue())
+        listener = QueueListener(handler.queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(_stop_listener, listener)
+
+    # Sampled loggers are named relative to app.logger, e.g. "metrics" for app.logger.getChild('metrics')
+    sampled = [f'{app.logger.name}.{name.strip()}' for name in app.config['LOG_SAMPLED_LOGGERS'].split(',')
+               if name.strip()]
+    handler.addFilter(SamplingFilter(app.config['LOG_SAMPLE_RATE'], sampled))
+
+    for logger in (app.logger, logging.getLogger('application')):
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return listener
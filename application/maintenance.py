@@ -0,0 +1,61 @@
+"""
+Housekeeping jobs run from the scheduler or the ``flask`` CLI.
+"""
+
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from application.models import db, Slot, Booking, BookingArchive
+from application.versions import drop_versions
+
+
+def purge_old_slots(today, batch_size=500):
+    """Delete slots dated before ``today`` in chunks of ``batch_size``.
+
+    Bookings of those slots are copied to ``booking_archive`` and deleted in the
+    same transaction as their slots, as are the data versions of the dates left
+    without slots. Each chunk commits separately so write locks are only held
+    briefly. Returns a report with the rows removed, the
+    oldest purged date and the elapsed time.
+    """
+    started = time.perf_counter()
+    report = {'slots_deleted': 0, 'bookings_archived': 0, 'batches': 0, 'oldest_date': None}
+    report['oldest_date'] = db.session.query(func.min(Slot.slot_date)).filter(Slot.slot_date < today).scalar()
+
+    while True:
+        slot_ids = db.session.execute(
+            select(Slot.id).where(Slot.slot_date < today).order_by(Slot.id).limit(batch_size)
+        ).scalars().all()
+        if not slot_ids:
+            break
+
+        archived = db.session.execute(
+            insert(BookingArchive).from_select(
+                ['booking_id', 'user_id', 'slot_date', 'slot_start_time', 'slot_end_time',
+                 'description', 'event_id', 'archived_at'],
+                select(Booking.id, Booking.user_id, Slot.slot_date, Slot.slot_start_time, Slot.slot_end_time,
+                       Booking.description, Booking.event_id, literal(datetime.utcnow()))
+                .join(Slot, Booking.slot_id == Slot.id)
+                .where(Booking.slot_id.in_(slot_ids))
+            )
+        )
+        dates = set(db.session.execute(
+            select(Slot.slot_date).where(Slot.id.in_(slot_ids)).distinct()
+        ).scalars())
+        db.session.execute(delete(Booking).where(Booking.slot_id.in_(slot_ids)))
+        deleted = db.session.execute(delete(Slot).where(Slot.id.in_(slot_ids)))
+        # A date split across chunks keeps its version until its last slot goes
+        remaining = set(db.session.execute(
+            select(Slot.slot_date).where(Slot.slot_date.in_(dates)).distinct()
+        ).scalars())
+        drop_versions(dates - remaining)
+        db.session.commit()
+
+        report['slots_deleted'] += deleted.rowcount
+        report['bookings_archived'] += max(archived.rowcount, 0)
+        report['batches'] += 1
+
+    report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return report
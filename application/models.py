@@ -1,3 +1,4 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 
@@ -13,8 +14,18 @@ class User(UserMixin, db.Model):
     password = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(10), nullable=False)
 
+# Case-insensitive existence checks at registration (application/accounts.py)
+db.Index('ix_user_username_lower', db.func.lower(User.username))
+db.Index('ix_user_email_lower', db.func.lower(User.email))
+
 class Slot(db.Model):
     __tablename__ = 'slot'
+    __table_args__ = (
+        db.UniqueConstraint('slot_date', 'slot_start_time', 'slot_end_time', name='uq_slot_date_times'),
+        db.Index('ix_slot_date_available', 'slot_date', 'available'),
+        # Keyset pagination order of the slot listings (application/api.py)
+        db.Index('ix_slot_date_start_id', 'slot_date', 'slot_start_time', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     slot_date = db.Column(db.Date, nullable=False)
     slot_start_time = db.Column(db.Time, nullable=False)
@@ -27,10 +38,88 @@ class Slot(db.Model):
 
 class Booking(db.Model):
     __tablename__ = 'booking'
+    __table_args__ = (
+        # A slot can only be booked once; also serves as the slot_id index
+        db.UniqueConstraint('slot_id', name='uq_booking_slot_id'),
+        db.Index('ix_booking_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     slot_id = db.Column(db.Integer, db.ForeignKey('slot.id'))
     description = db.Column(db.String(255))
-    event_id = db.Column(db.String(80), nullable=False)
+    # Filled in by the calendar sync worker once Google has accepted the event
+    event_id = db.Column(db.String(80), nullable=True)
+    calendar_status = db.Column(db.String(20), nullable=False, default='pending')
     user = db.relationship('User', backref='bookings')
-    slot = db.relationship('Slot', backref='bookings')
\ No newline at end of file
+    slot = db.relationship('Slot', backref='bookings')
+
+class CalendarOutbox(db.Model):
+    """Pending Google Calendar writes, drained by the calendar sync worker"""
+    __tablename__ = 'calendar_outbox'
+    __table_args__ = (
+        db.Index('ix_calendar_outbox_status_due', 'status', 'next_attempt_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    # Not a foreign key: delete tasks outlive the booking they came from
+    booking_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(10), nullable=False)
+    payload = db.Column(db.Text)
+    event_id = db.Column(db.String(80))
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class BookingArchive(db.Model):
+    """Bookings of past slots, kept when the slots themselves are purged"""
+    __tablename__ = 'booking_archive'
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    slot_date = db.Column(db.Date, nullable=False)
+    slot_start_time = db.Column(db.Time, nullable=False)
+    slot_end_time = db.Column(db.Time, nullable=False)
+    description = db.Column(db.String(255))
+    event_id = db.Column(db.String(80))
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class JobLock(db.Model):
+    """Lease on a named lock; the scheduler uses it to elect one leader process"""
+    __tablename__ = 'job_lock'
+    name = db.Column(db.String(80), primary_key=True)
+    owner = db.Column(db.String(120), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class JobRun(db.Model):
+    """One execution of a scheduled job"""
+    __tablename__ = 'job_run'
+    __table_args__ = (
+        db.Index('ix_job_run_name_started', 'job_name', 'started_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(80), nullable=False)
+    owner = db.Column(db.String(120))
+    status = db.Column(db.String(20), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)
+    detail = db.Column(db.Text)
+
+class CalendarSyncState(db.Model):
+    """Where calendar reconciliation left off: the sync token of its date window"""
+    __tablename__ = 'calendar_sync_state'
+    calendar_id = db.Column(db.String(255), primary_key=True)
+    sync_token = db.Column(db.Text)
+    window_start = db.Column(db.Date)
+    window_end = db.Column(db.Date)
+    full_synced_at = db.Column(db.DateTime)
+    synced_at = db.Column(db.DateTime)
+
+class DataVersion(db.Model):
+    """Per-date counter bumped whenever that date's slots or bookings change"""
+    __tablename__ = 'data_version'
+    slot_date = db.Column(db.Date, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
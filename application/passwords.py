@@ -0,0 +1,46 @@
+"""
+Password hashing for user accounts.
+
+Hashes are produced by werkzeug with the method set in ``PASSWORD_HASH_METHOD``
+(e.g. ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``); the method and its
+cost parameters are stored as the hash prefix. After a successful login,
+``needs_rehash`` tells whether the stored hash was made with other settings
+so it can be replaced transparently. Plaintext passwords from before hashing
+was introduced are hashed by the ``d7a3f9b2c415`` migration and no longer
+accepted.
+"""
+
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+_HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+def is_hashed(stored):
+    return stored.startswith(_HASH_PREFIXES) and stored.count('$') == 2
+
+
+def hash_password(password, method=DEFAULT_METHOD):
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored, password):
+    """Check ``password`` against a stored hash; anything else never matches"""
+    return is_hashed(stored) and check_password_hash(stored, password)
+
+
+@lru_cache(maxsize=None)
+def expanded_method(method):
+    """The prefix werkzeug stores for ``method``, with its default cost filled in.
+
+    ``scrypt`` is stored as ``scrypt:32768:8:1`` and ``pbkdf2:sha256`` as
+    ``pbkdf2:sha256:<iterations>``; hashing once per method is the only way
+    to learn werkzeug's defaults.
+    """
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def needs_rehash(stored, method=DEFAULT_METHOD):
+    return stored.split('$', 1)[0] != expanded_method(method)
@@ -0,0 +1,89 @@
+"""
+Lightweight stand-in for the logged-in user.
+
+Flask-Login calls ``load_user`` on every authenticated request. Instead of an
+ORM ``User`` it gets a ``UserPrincipal`` (id, username, email, names, role)
+served from a short-TTL cache keyed by user id, so role checks and booking
+metadata need no query once the principal is cached.
+
+Cached principals are dropped when a ``User`` row is updated or deleted: the
+ids are collected at flush time and removed from the cache after the
+transaction commits. With the in-process backend other workers may keep a
+stale principal for at most ``PRINCIPAL_CACHE_TTL`` seconds.
+"""
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from application.models import db, User
+
+FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'role')
+
+
+class UserPrincipal(UserMixin):
+    """Detached, read-only view of a ``User``"""
+
+    def __init__(self, id, username, email, first_name, last_name, role):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.first_name = first_name
+        self.last_name = last_name
+        self.role = role
+
+    @property
+    def full_name(self):
+        return f'{self.first_name} {self.last_name}'
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(**{field: getattr(user, field) for field in FIELDS})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+class PrincipalCache:
+    """``UserPrincipal`` per user id, loaded from the DB on miss"""
+
+    def __init__(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+
+    @staticmethod
+    def _key(user_id):
+        return f'principal:{user_id}'
+
+    def get(self, user_id):
+        if self.enabled:
+            cached = self.backend.get(self._key(user_id))
+            if cached is not None:
+                return UserPrincipal(**cached)
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        principal = UserPrincipal.from_user(user)
+        if self.enabled:
+            self.backend.set(self._key(user_id), principal.to_dict())
+        return principal
+
+    def invalidate(self, user_ids):
+        self.backend.delete_many([self._key(user_id) for user_id in user_ids])
+
+    def watch(self, session=db.session):
+        """Invalidate principals of users changed through ``session``"""
+        @event.listens_for(session, 'after_flush')
+        def collect_changed_users(session, flush_context):
+            changed = [obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)]
+            if changed:
+                session.info.setdefault('changed_user_ids', set()).update(changed)
+
+        @event.listens_for(session, 'after_commit')
+        def invalidate_changed_users(session):
+            changed = session.info.pop('changed_user_ids', None)
+            if changed:
+                self.invalidate(changed)
+
+        @event.listens_for(session, 'after_rollback')
+        def forget_changed_users(session):
+            session.info.pop('changed_user_ids', None)
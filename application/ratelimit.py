@@ -0,0 +1,37 @@
+"""
+In-process token bucket rate limiting per client.
+
+Each client key (usually the remote address) gets a bucket of ``burst``
+tokens refilled at ``rate`` tokens per second. Buckets live in the worker
+process, so with several gunicorn workers a client can get up to that many
+times the limit; that is enough to keep a burst of keystrokes off the DB.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    def __init__(self, rate=5.0, burst=10, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Take a token for ``key``; returns ``(allowed, retry_after_seconds)``"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        retry_after = 0 if allowed else math.ceil((1 - tokens) / self.rate)
+        return allowed, retry_after
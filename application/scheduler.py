@@ -0,0 +1,156 @@
+"""
+Periodic jobs that are safe to schedule in every gunicorn worker.
+
+Each worker runs its own APScheduler, but a job body only executes in the
+process that holds the ``scheduler`` lease in ``job_lock``. Workers try to
+take or renew the lease on a heartbeat; the lease is a row updated with a
+conditional UPDATE (or created with an INSERT guarded by the primary key), so
+SQLite and Postgres both guarantee a single holder. If the leader dies, the
+lease expires and another worker takes over on its next heartbeat.
+
+Every run is recorded in ``job_run`` with its status and duration.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from application.models import db, JobLock, JobRun
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    """Time-limited lease on a ``job_lock`` row"""
+
+    def __init__(self, name='scheduler', lease_seconds=60):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._lease_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_leader(self):
+        # Stop acting as leader a little before the lease can be taken over
+        return time.monotonic() < self._lease_until - self.lease_seconds * 0.1
+
+    def try_acquire(self):
+        """Take or renew the lease; must run inside an app context"""
+        with self._lock:
+            now = datetime.utcnow()
+            expires_at = now + timedelta(seconds=self.lease_seconds)
+            started = time.monotonic()
+            try:
+                result = db.session.execute(
+                    update(JobLock)
+                    .where(JobLock.name == self.name,
+                           or_(JobLock.owner == self.owner, JobLock.expires_at < now))
+                    .values(owner=self.owner, expires_at=expires_at)
+                )
+                acquired = result.rowcount == 1
+                if not acquired and db.session.get(JobLock, self.name) is None:
+                    db.session.add(JobLock(name=self.name, owner=self.owner, expires_at=expires_at))
+                    db.session.flush()
+                    acquired = True
+                db.session.commit()
+            except IntegrityError:
+                # Another worker created the row first
+                db.session.rollback()
+                acquired = False
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f'Could not renew scheduler lease: {e}')
+                acquired = False
+
+            was_leader = self.is_leader
+            self._lease_until = started + self.lease_seconds if acquired else 0.0
+            if acquired and not was_leader:
+                logger.info(f'{self.owner} is now the scheduler leader')
+            return acquired
+
+    def release(self):
+        with self._lock:
+            if not self._lease_until:
+                return
+            self._lease_until = 0.0
+            try:
+                db.session.query(JobLock).filter_by(name=self.name, owner=self.owner).delete()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f'Could not release scheduler lease: {e}')
+
+
+class JobRunner:
+    """Wraps job functions so they only run on the leader and are recorded in ``job_run``"""
+
+    def __init__(self, app, election, slow_job_seconds=30):
+        self.app = app
+        self.election = election
+        self.slow_job_seconds = slow_job_seconds
+
+    def heartbeat(self):
+        with self.app.app_context():
+            try:
+                self.election.try_acquire()
+            finally:
+                db.session.remove()
+
+    def wrap(self, name, func):
+        def run():
+            if not self.election.is_leader:
+                return
+            with self.app.app_context():
+                try:
+                    self.run(name, func)
+                finally:
+                    db.session.remove()
+        run.__name__ = f'{name}_job'
+        return run
+
+    def run(self, name, func):
+        """Execute ``func`` now and record the run; needs an app context"""
+        job_run = JobRun(job_name=name, owner=self.election.owner, started_at=datetime.utcnow())
+        db.session.add(job_run)
+        db.session.commit()
+        run_id = job_run.id
+
+        started = time.perf_counter()
+        status, detail = 'success', None
+        try:
+            result = func()
+            if result is not None:
+                detail = json.dumps(result, default=str)
+        except Exception as e:
+            db.session.rollback()
+            status, detail = 'failed', str(e)
+            logger.error(f'Scheduled job {name} failed: {e}')
+        duration = time.perf_counter() - started
+
+        job_run = db.session.get(JobRun, run_id)
+        job_run.status = status
+        job_run.detail = detail
+        job_run.finished_at = datetime.utcnow()
+        job_run.duration_seconds = round(duration, 3)
+        db.session.commit()
+
+        if duration > self.slow_job_seconds:
+            logger.warning(f'Scheduled job {name} took {duration:.1f}s')
+        return job_run
+
+
+def prune_job_runs(retention_days=30):
+    """Delete ``job_run`` rows older than ``retention_days``"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    deleted = JobRun.query.filter(JobRun.started_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted': deleted}
@@ -0,0 +1,131 @@
+"""
+Slot grid generation for bulk slot creation.
+
+``iter_slot_grid`` lazily yields the candidate (date, start, end) slots and is
+shared by the bulk preview and the confirm step. The preview streams the grid
+day by day (``iter_slot_grid_by_date``), so memory stays flat even for a full
+academic year of short slots.
+
+When creating slots, the grid of candidate slots is computed in a single
+pass, existing slots for the whole date range are fetched with one query, and
+only the missing ones are written with chunked multi-row inserts that ignore
+conflicts on the (slot_date, slot_start_time, slot_end_time) unique constraint.
+"""
+
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import insert
+
+from application.models import db, Slot
+
+INSERT_CHUNK_SIZE = 1000
+
+
+def day_time_steps(start_time, end_time, duration):
+    """(start, end) times of every slot that fits between start_time and end_time"""
+    if duration <= 0:
+        raise ValueError('Slot duration must be positive')
+    step = timedelta(minutes=duration)
+    # Any date will do; only the time of day matters here
+    current_dt = datetime.combine(datetime.min.date(), start_time)
+    end_dt = datetime.combine(datetime.min.date(), end_time)
+    steps = []
+    while current_dt + step <= end_dt:
+        steps.append((current_dt.time(), (current_dt + step).time()))
+        current_dt += step
+    return steps
+
+
+def iter_slot_grid(start_date, end_date, start_time, end_time, duration, excluded_days=()):
+    """Yield (date, start_time, end_time) for every candidate slot in the range"""
+    steps = day_time_steps(start_time, end_time, duration)
+    excluded_days = {day.lower() for day in excluded_days}
+    current_date = start_date
+    while current_date <= end_date:
+        if current_date.strftime('%A').lower() not in excluded_days:
+            for slot_start, slot_end in steps:
+                yield current_date, slot_start, slot_end
+        current_date += timedelta(days=1)
+
+
+def iter_slot_grid_by_date(start_date, end_date, start_time, end_time, duration, excluded_days=()):
+    """Yield one ``{'date': ..., 'slots': [{'start', 'end'}]}`` dict per day with slots"""
+    grid = iter_slot_grid(start_date, end_date, start_time, end_time, duration, excluded_days)
+    for slot_date, day_slots in groupby(grid, key=lambda slot: slot[0]):
+        yield {
+            'date': slot_date.strftime('%Y-%m-%d'),
+            'slots': [{'start': slot_start.strftime('%H:%M'), 'end': slot_end.strftime('%H:%M')}
+                      for _, slot_start, slot_end in day_slots],
+        }
+
+
+def count_slot_grid(start_date, end_date, start_time, end_time, duration, excluded_days=()):
+    """(slot_count, day_count) of the grid, without generating the slots"""
+    slots_per_day = len(day_time_steps(start_time, end_time, duration))
+    if not slots_per_day:
+        return 0, 0
+    excluded_days = {day.lower() for day in excluded_days}
+    day_count = 0
+    current_date = start_date
+    while current_date <= end_date:
+        if current_date.strftime('%A').lower() not in excluded_days:
+            day_count += 1
+        current_date += timedelta(days=1)
+    return slots_per_day * day_count, day_count
+
+
+def _insert_ignoring_conflicts():
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(Slot.__table__).on_conflict_do_nothing(
+            index_elements=['slot_date', 'slot_start_time', 'slot_end_time'])
+    if dialect == 'sqlite':
+        return insert(Slot.__table__).prefix_with('OR IGNORE')
+    return insert(Slot.__table__)
+
+
+def create_slot_grid(start_date, end_date, start_time, end_time, duration, excluded_days=(),
+                     chunk_size=INSERT_CHUNK_SIZE):
+    """Create every missing slot in the grid; returns (created_count, skipped_count).
+
+    The caller commits.
+    """
+    existing = set(
+        db.session.query(Slot.slot_date, Slot.slot_start_time, Slot.slot_end_time)
+        .filter(Slot.slot_date >= start_date, Slot.slot_date <= end_date)
+    )
+
+    stmt = _insert_ignoring_conflicts()
+    created_count = 0
+    skipped_count = 0
+    rows = []
+
+    def flush():
+        nonlocal created_count, skipped_count
+        # Core executemany on the session's connection: no ORM objects per row
+        result = db.session.connection().execute(stmt, rows)
+        # Rows that lost a race with a concurrent insert are ignored by the DB
+        inserted = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(rows)
+        created_count += inserted
+        skipped_count += len(rows) - inserted
+        rows.clear()
+
+    for slot_date, slot_start, slot_end in iter_slot_grid(
+            start_date, end_date, start_time, end_time, duration, excluded_days):
+        if (slot_date, slot_start, slot_end) in existing:
+            skipped_count += 1
+            continue
+        rows.append({
+            'slot_date': slot_date,
+            'slot_start_time': slot_start,
+            'slot_end_time': slot_end,
+            'available': True,
+        })
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+
+    return created_count, skipped_count
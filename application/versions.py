@@ -0,0 +1,90 @@
+"""
+Per-date data version counters.
+
+Every change to a date's slots or bookings (booking, cancelling, creating,
+deleting or toggling slots, purging old ones) bumps that date's row in
+``data_version`` after the change is committed. The counters live in the
+database, so every worker sees the same value: they version the keys of
+the availability cache and make up the ETags of the slot listings. A date
+that has never changed has version 0.
+
+Purging a date's last slots deletes its row in the purge transaction
+(``drop_versions``), taking the date back to version 0, which again
+describes a date without slots. The dropped versions are added to the
+``PURGED_DATE`` row, so ``overall_version`` never returns to a value it
+had before.
+
+Readers must take the version before reading the data it describes. A
+reader racing a change then pairs the old version with new data at worst,
+which only costs a re-render later, never a stale 304.
+"""
+
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from application.models import db, DataVersion
+
+# Keep IN lists well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+# Row carrying the versions of purged dates; outside any date window read
+PURGED_DATE = date.min
+
+
+def _chunks(values):
+    values = sorted(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def bump_versions(dates):
+    """Increment the version of each date and commit; call after committing the change"""
+    for chunk in _chunks(set(dates)):
+        for attempt in range(2):
+            try:
+                existing = {d for (d,) in db.session.query(DataVersion.slot_date)
+                            .filter(DataVersion.slot_date.in_(chunk))}
+                if existing:
+                    db.session.query(DataVersion).filter(DataVersion.slot_date.in_(existing)) \
+                        .update({DataVersion.version: DataVersion.version + 1}, synchronize_session=False)
+                db.session.add_all(DataVersion(slot_date=d, version=1) for d in chunk if d not in existing)
+                db.session.commit()
+                break
+            except IntegrityError:
+                # Another process inserted one of the missing dates first; its row now exists
+                db.session.rollback()
+                if attempt:
+                    raise
+
+
+def drop_versions(dates):
+    """Delete the rows of dates whose slots are all gone, in the caller's transaction"""
+    dropped = 0
+    for chunk in _chunks(set(dates)):
+        rows = DataVersion.slot_date.in_(chunk)
+        dropped += db.session.query(func.coalesce(func.sum(DataVersion.version), 0)).filter(rows).scalar()
+        db.session.query(DataVersion).filter(rows).delete(synchronize_session=False)
+    if not dropped:
+        return
+    updated = db.session.query(DataVersion).filter(DataVersion.slot_date == PURGED_DATE) \
+        .update({DataVersion.version: DataVersion.version + dropped + 1}, synchronize_session=False)
+    if not updated:
+        db.session.add(DataVersion(slot_date=PURGED_DATE, version=dropped + 1))
+
+
+def date_versions(first_day, last_day):
+    """``{date: version}`` for the dates in the window that have ever changed"""
+    return dict(db.session.query(DataVersion.slot_date, DataVersion.version).filter(
+        DataVersion.slot_date >= first_day, DataVersion.slot_date <= last_day
+    ))
+
+
+def date_version(day):
+    return date_versions(day, day).get(day, 0)
+
+
+def overall_version():
+    """Changes whenever any date's version does; for listings that span all dates"""
+    count, total = db.session.query(func.count(DataVersion.slot_date), func.sum(DataVersion.version)).one()
+    return f'{count}.{total or 0}'
@@ -0,0 +1,136 @@
+"""
+Shared setup of the benchmark scripts.
+
+Every benchmark runs against a scratch database, a temporary SQLite file
+unless ``--database-url`` names another, whose tables are dropped and
+recreated, so never point it at real data. ``scratch_app`` configures the
+app for it (no scheduler, no calendar sync worker, no per-request log
+lines) and must run before anything imports ``app``. The seeding helpers
+use Core bulk inserts and log in as ``PASSWORD``.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import time as dt_time, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PASSWORD = 'benchmark-password'
+INSERT_CHUNK = 5000
+
+
+def argument_parser(description):
+    """Parser with the options every benchmark takes: ``--database-url`` and ``--json``"""
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='scratch database (default: temporary SQLite file)')
+    parser.add_argument('--json', help='also write the results to this file')
+    return parser
+
+
+def scratch_database_url(name, database_url=None, workdir=None):
+    return database_url or 'sqlite:///' + os.path.join(workdir or tempfile.mkdtemp(), f'{name}.db')
+
+
+def scratch_environment(name, database_url=None, workdir=None, **overrides):
+    """Set the app's environment for a benchmark run and return it; ``overrides`` win"""
+    env = {
+        'DATABASE_URL': scratch_database_url(name, database_url, workdir),
+        'FLASK_ENV': 'development',
+        'SKIP_SCHEDULER': 'true',
+        'CALENDAR_SYNC_ENABLED': 'false',
+        'METRICS_LOG_REQUESTS': 'false',
+        **{key: str(value) for key, value in overrides.items()},
+    }
+    os.environ.update(env)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return env
+
+
+def scratch_app(name, database_url=None, workdir=None, **overrides):
+    """Import the app configured for a scratch database, with empty tables"""
+    scratch_environment(name, database_url, workdir, **overrides)
+    from app import app
+
+    app.config['DEBUG'] = False
+    reset_database(app)
+    return app
+
+
+def reset_database(app):
+    """Drop and recreate every table"""
+    from application.models import db
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+
+def database_name(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0]
+
+
+def seed_users(app, teachers=0, admin=False):
+    """Insert teachers ``teacher0``, ``teacher1``... and optionally ``admin``; returns the teacher ids"""
+    from sqlalchemy import insert
+    from application.models import db, User
+    from application.passwords import hash_password
+
+    password_hash = hash_password(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    users = [{'first_name': 'Admin', 'last_name': 'User', 'email': 'admin@example.com',
+              'username': 'admin', 'password': password_hash, 'role': 'admin'}] if admin else []
+    users += [{'first_name': 'Teacher', 'last_name': str(i), 'email': f'teacher{i}@example.com',
+               'username': f'teacher{i}', 'password': password_hash, 'role': 'teacher'}
+              for i in range(teachers)]
+    with app.app_context():
+        db.session.execute(insert(User), users)
+        db.session.commit()
+        return [user_id for (user_id,) in db.session.query(User.id)
+                .filter(User.role == 'teacher').order_by(User.id)]
+
+
+def _clock(minutes):
+    return dt_time(minutes // 60 % 24, minutes % 60)
+
+
+def slot_rows(first_day, count, per_day=8, start_hour=9, minutes=60):
+    """Rows of ``count`` free slots, ``per_day`` back to back slots a day from ``first_day``"""
+    for i in range(count):
+        start = start_hour * 60 + (i % per_day) * minutes
+        yield {'slot_date': first_day + timedelta(days=i // per_day), 'slot_start_time': _clock(start),
+               'slot_end_time': _clock(start + minutes), 'available': True}
+
+
+def seed_slots(app, first_day, count, **layout):
+    """Insert ``slot_rows(first_day, count, **layout)``; returns every slot id in id order"""
+    from sqlalchemy import insert
+    from application.models import db, Slot
+
+    rows = list(slot_rows(first_day, count, **layout))
+    with app.app_context():
+        for start in range(0, len(rows), INSERT_CHUNK):
+            db.session.execute(insert(Slot), rows[start:start + INSERT_CHUNK])
+        db.session.commit()
+        return [slot_id for (slot_id,) in db.session.query(Slot.id).order_by(Slot.id)]
+
+
+def login(app, username):
+    """Test client logged in as ``username``"""
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': PASSWORD})
+    return client
+
+
+def percentile(values, fraction):
+    """Value at ``fraction`` of the already sorted ``values``"""
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(results, json_path=None):
+    """Print the results and also write them to ``json_path`` if given"""
+    print(json.dumps(results, indent=2))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Keyset vs OFFSET pagination of the slot listing as the table grows.
+
+Seeds ``--slots`` free slots, then for pages at increasing depth times:
+
+* ``keyset``: GET /api/v1/slots with the cursor of the row before the page
+* ``offset``: the same page selected with LIMIT/OFFSET, for comparison
+* ``unbounded``: every free slot in one query, as /admin/slots used to load
+
+    python benchmarks/api_pagination.py
+    python benchmarks/api_pagination.py --slots 200000 --json pagination.json
+
+Runs against a scratch database (see ``_harness``).
+"""
+
+import statistics
+import time
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, login, report, scratch_app, seed_slots, seed_users
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--slots', type=int, default=50000, help='free slots to seed')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20, help='requests per measurement')
+    return parser.parse_args()
+
+
+def timed(func, repeat):
+    func()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return round(statistics.median(latencies) * 1000, 3)
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('api_pagination', args.database_url)
+    from application.api import SLOTS, slot_filters
+    from application.models import Slot
+
+    free = {'available': 'true', 'booked': 'false'}
+    seed_users(app, admin=True)
+    seed_slots(app, date.today() + timedelta(days=1), args.slots, per_day=16, start_hour=6)
+    client = login(app, 'admin')
+
+    results = {'database': database_name(app), 'slots': args.slots,
+               'page_size': args.page_size, 'pages': []}
+    depths = sorted({0, args.slots // 10, args.slots // 2, args.slots - args.page_size})
+    with app.app_context():
+        fields = ['id', 'slot_date', 'slot_start_time', 'slot_end_time', 'available']
+        for depth in depths:
+            cursor = None
+            if depth:
+                # Cursor of the row just before the page, as the previous page would have returned it
+                before = SLOTS.page(slot_filters(free), fields=fields, limit=depth)['data'][-1]
+                cursor = SLOTS.encode_cursor('slot_date', before)
+            url = f'/api/v1/slots?available=true&booked=false&limit={args.page_size}' + \
+                (f'&cursor={cursor}' if cursor else '')
+
+            def offset_page():
+                query = Slot.query.filter(*slot_filters(free)) \
+                    .order_by(Slot.slot_date, Slot.slot_start_time, Slot.id)
+                return query.offset(depth).limit(args.page_size).all()
+
+            results['pages'].append({
+                'offset': depth,
+                'keyset_ms': timed(lambda: client.get(url), args.repeat),
+                'offset_query_ms': timed(offset_page, args.repeat),
+            })
+        results['unbounded_query_ms'] = timed(
+            lambda: Slot.query.filter(Slot.available == True, ~Slot.bookings.any()).all(), max(1, args.repeat // 4))
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Concurrent booking storm against the real Flask app.
+
+Every round, ``--threads`` teachers (each with their own logged-in test
+client) are released at once against the same slot. Afterwards the script
+checks that no slot ended up with more than one booking:
+
+    python benchmarks/booking_race.py --threads 32 --slots 50
+    python benchmarks/booking_race.py --database-url postgresql://... --json race.json
+
+Runs against a scratch database (see ``_harness``). Calendar sync is
+disabled; bookings stay in the outbox.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, login, percentile, report, scratch_app, seed_slots, seed_users
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--threads', type=int, default=32, help='concurrent teachers per slot')
+    parser.add_argument('--slots', type=int, default=50, help='number of contested slots')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('booking_race', args.database_url)
+    from application.models import db, Booking
+
+    seed_users(app, teachers=args.threads)
+    slot_ids = seed_slots(app, date.today() + timedelta(days=1), args.slots)
+    clients = [login(app, f'teacher{i}') for i in range(args.threads)]
+
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def contend(client, slot_id, barrier):
+        barrier.wait()
+        started = time.perf_counter()
+        response = client.post(f'/book/{slot_id}', data={'description': 'race'})
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[response.status_code] += 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    for slot_id in slot_ids:
+        barrier = threading.Barrier(args.threads)
+        threads = [threading.Thread(target=contend, args=(client, slot_id, barrier)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+
+    with app.app_context():
+        per_slot = Counter(slot_id for (slot_id,) in db.session.query(Booking.slot_id))
+    double_booked = {slot_id: count for slot_id, count in per_slot.items() if count > 1}
+
+    latencies.sort()
+    results = {
+        'database': database_name(app),
+        'threads': args.threads,
+        'slots': args.slots,
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'status_codes': dict(statuses),
+        'booked_slots': len(per_slot),
+        'double_booked_slots': double_booked,
+    }
+    report(results, args.json)
+    sys.exit(1 if double_booked else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Calendar sync throughput while the Google Calendar API is slow or down.
+
+Starts the fake Calendar server (``fake_calendar_server.py``) and points the
+real ``GoogleCalendarClient`` at it, then drains a seeded outbox of
+``--inserts`` event inserts (sent as one batch) and ``--deletes`` event
+deletes (one call each) under these conditions:
+
+* ``healthy``: ``--latency-ms`` per request
+* ``healthy_pool``: the same, with ``--concurrency`` threads making the calls
+* ``slow``: ``--slow-latency-ms`` per request, still under the timeout
+* ``slow_pool``: the same, with ``--concurrency`` threads
+* ``down_no_breaker``: requests hang past ``--timeout``; every call waits it out
+* ``down_breaker``: the same with the circuit breaker, which opens after
+  ``--breaker-failures`` timeouts and defers the rest of the pass at once
+
+For each the report gives the wall time of one sync pass, the tasks done,
+retried and deferred, and the HTTP requests the server saw. A pass holds the
+sync thread for its whole wall time, and ``down_no_breaker`` shows why
+unbounded calls must not run inside requests.
+
+    python benchmarks/calendar_degraded.py
+    python benchmarks/calendar_degraded.py --deletes 50 --concurrency 16 --json degraded.json
+
+Runs against a scratch database (see ``_harness``), reseeded for every
+scenario.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, report, reset_database, scratch_app, seed_slots, seed_users
+from fake_calendar_server import FakeCalendarServer, redirected_http
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--inserts', type=int, default=20, help='pending event inserts per pass')
+    parser.add_argument('--deletes', type=int, default=20, help='pending event deletes per pass')
+    parser.add_argument('--latency-ms', type=int, default=50, help='healthy request latency')
+    parser.add_argument('--slow-latency-ms', type=int, default=500, help='degraded latency, under the timeout')
+    parser.add_argument('--timeout', type=float, default=1.0, help='client socket timeout in seconds')
+    parser.add_argument('--concurrency', type=int, default=8, help='threads of the pooled scenarios')
+    parser.add_argument('--breaker-failures', type=int, default=3)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('calendar_degraded', args.database_url)
+    logging.disable(logging.WARNING)
+    from application.calendar_client import GoogleCalendarClient, is_outage
+    from application.calendar_sync import enqueue_event_delete, enqueue_event_insert, process_outbox
+    from application.circuit import CircuitBreaker
+    from application.models import db, Slot, Booking, CalendarOutbox
+
+    server = FakeCalendarServer().start()
+    hang = args.timeout * 3
+
+    scenarios = {
+        'healthy': {'latency': args.latency_ms / 1000},
+        'healthy_pool': {'latency': args.latency_ms / 1000, 'concurrency': args.concurrency},
+        'slow': {'latency': args.slow_latency_ms / 1000},
+        'slow_pool': {'latency': args.slow_latency_ms / 1000, 'concurrency': args.concurrency},
+        'down_no_breaker': {'latency': hang},
+        'down_breaker': {'latency': hang, 'breaker': True},
+    }
+
+    def seed():
+        reset_database(app)
+        (teacher_id,) = seed_users(app, teachers=1)
+        seed_slots(app, date.today() + timedelta(days=1), args.inserts)
+        for slot in Slot.query.order_by(Slot.id):
+            booking = Booking(user_id=teacher_id, slot_id=slot.id, description='benchmark')
+            db.session.add(booking)
+            db.session.flush()
+            enqueue_event_insert(booking, {'summary': f'slot {slot.id}'})
+        server.events.clear()
+        for i in range(args.deletes):
+            server.events[f'existing{i}'] = {'id': f'existing{i}'}
+            enqueue_event_delete(f'existing{i}')
+        db.session.commit()
+
+    results = {'database': database_name(app), 'inserts': args.inserts,
+               'deletes': args.deletes, 'timeout_s': args.timeout, 'scenarios': {}}
+    with app.app_context():
+        for name, scenario in scenarios.items():
+            seed()
+            breaker = CircuitBreaker('benchmark', failure_threshold=args.breaker_failures, reset_timeout=60,
+                                     is_failure=is_outage) if scenario.get('breaker') else None
+            client = GoogleCalendarClient(None, 'benchmark@example.com', timeout=args.timeout, breaker=breaker,
+                                          http_factory=redirected_http(server.url, timeout=args.timeout))
+            server.latency = 0
+            client.service  # build the service outside the measurement
+            server.latency = scenario['latency']
+            server.requests = 0
+            executor = ThreadPoolExecutor(scenario['concurrency']) if scenario.get('concurrency') else None
+
+            started = time.perf_counter()
+            stats = process_outbox(client, batch_size=args.inserts + args.deletes, executor=executor)
+            elapsed = time.perf_counter() - started
+            if executor is not None:
+                executor.shutdown()
+
+            results['scenarios'][name] = {
+                'latency_ms': round(scenario['latency'] * 1000),
+                'concurrency': scenario.get('concurrency', 1),
+                'breaker': bool(breaker),
+                'pass_s': round(elapsed, 3),
+                'done_per_s': round(stats['done'] / elapsed, 1),
+                'http_requests': server.requests,
+                'pending_after': CalendarOutbox.query.filter_by(status='pending').count(),
+                **stats,
+            }
+    server.shutdown()
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
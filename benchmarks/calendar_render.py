@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Render time and response size of the teacher booking calendar.
+
+Seeds free slots on every day from today to the end of the year, logs a
+teacher in and times:
+
+* ``page``: the full ``/teacher_slots`` page, which renders the current month
+* ``month``: one month fragment fetched with ``X-Requested-With`` (``?month=``)
+* ``year``: all twelve month fragments rendered into one response, i.e. what
+  the page cost when it rendered the whole year at once
+
+    python benchmarks/calendar_render.py
+    python benchmarks/calendar_render.py --repeat 200 --json calendar.json
+
+Availability is served from the warm availability cache after the first
+request, so the numbers are dominated by template rendering. Runs against a
+scratch database (see ``_harness``).
+"""
+
+import statistics
+import time
+from datetime import date
+
+from _harness import argument_parser, database_name, login, percentile, report, scratch_app, seed_slots, seed_users
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--repeat', type=int, default=100, help='requests per measurement')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('calendar_render', args.database_url)
+    from flask import render_template
+    from app import availability_cache
+    from application.calendar_view import year_grid
+
+    today = date.today()
+    seed_users(app, teachers=1)
+    seed_slots(app, today, (today.replace(month=12, day=31) - today).days + 1, per_day=1)
+    client = login(app, 'teacher0')
+
+    def year_response():
+        with app.test_request_context('/teacher_slots'):
+            return ''.join(
+                render_template('calendar_month.html', month=month, available_dates={
+                    d.isoformat() for d in availability_cache.available_dates(month.first_day, month.last_day)
+                })
+                for month in year_grid(today.year)
+            ).encode()
+
+    month_key = f'{today.year:04d}-{today.month:02d}'
+    measurements = {
+        'page': lambda: client.get('/teacher_slots').data,
+        'month': lambda: client.get(f'/teacher_slots?month={month_key}',
+                                    headers={'X-Requested-With': 'XMLHttpRequest'}).data,
+        'year': year_response,
+    }
+
+    results = {'database': database_name(app), 'repeat': args.repeat, 'measurements': {}}
+    for name, fetch in measurements.items():
+        body = fetch()  # warm the availability cache and the template cache
+        latencies = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fetch()
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        results['measurements'][name] = {
+            'bytes': len(body),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        }
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
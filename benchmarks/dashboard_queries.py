@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Check that the dashboards run a fixed number of SQL statements, however many
+bookings they list.
+
+Seeds ``--teachers`` teachers and an admin, books a few past and upcoming
+slots and counts the statements (``before_cursor_execute`` events) of each
+dashboard route. It then adds ``--bookings`` more bookings, half of them for
+the teacher whose dashboard is checked and the rest spread over every
+teacher, so every page is full, and counts again. A route whose count grew
+is loading something per row (an N+1 query), and the script exits with
+status 1:
+
+    python benchmarks/dashboard_queries.py
+    python benchmarks/dashboard_queries.py --bookings 2000 --json dashboard_queries.json
+
+Runs against a scratch database (see ``_harness``).
+"""
+
+import sys
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, login, report, scratch_app, seed_slots, seed_users
+
+ROUTES = (
+    ('admin', '/admin'),
+    ('admin', '/admin?filter=upcoming'),
+    ('admin', '/admin?filter=past'),
+    ('admin', '/admin?page=2'),
+    ('admin', '/admin/users'),
+    ('teacher', '/teacher'),
+    ('teacher', '/teacher?filter=upcoming'),
+    ('teacher', '/teacher?filter=past'),
+)
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--teachers', type=int, default=60, help='teachers the bookings are spread over')
+    parser.add_argument('--bookings', type=int, default=600, help='bookings added for the second count')
+    parser.add_argument('--repeat', type=int, default=3, help='requests per route; the lowest count is kept')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('dashboard_queries', args.database_url)
+    from sqlalchemy import event, insert
+    from application.models import db, Booking, Slot
+
+    today = date.today()
+    teacher_ids = seed_users(app, teachers=args.teachers, admin=True)
+    # Half the slots in the past, so the past filters list full pages too
+    days = args.bookings // 16 + 2
+    seed_slots(app, today - timedelta(days=days // 2), 16 * days, per_day=16, start_hour=6)
+    with app.app_context():
+        past = [slot_id for (slot_id,) in db.session.query(Slot.id).filter(Slot.slot_date < today).order_by(Slot.id)]
+        upcoming = [slot_id for (slot_id,) in db.session.query(Slot.id).filter(Slot.slot_date >= today)
+                    .order_by(Slot.id)]
+        engine = db.engine
+
+    def book(slot_ids):
+        # Every other booking goes to teacher0, whose dashboard is checked; the rest to everyone
+        with app.app_context():
+            db.session.execute(insert(Booking.__table__), [
+                {'user_id': teacher_ids[0 if i % 2 == 0 else i % len(teacher_ids)], 'slot_id': slot_id,
+                 'description': 'seed', 'event_id': f'seed{slot_id}', 'calendar_status': 'synced'}
+                for i, slot_id in enumerate(slot_ids)
+            ])
+            db.session.commit()
+
+    clients = {'admin': login(app, 'admin'), 'teacher': login(app, 'teacher0')}
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *a: statements.append(1))
+
+    def count_statements():
+        counts = {}
+        for role, path in ROUTES:
+            clients[role].get(path)  # warm the user principal cache
+            seen = []
+            for _ in range(args.repeat):
+                statements.clear()
+                response = clients[role].get(path)
+                if response.status_code != 200:
+                    sys.exit(f'{path} returned {response.status_code}')
+                seen.append(len(statements))
+            counts[path] = min(seen)
+        return counts
+
+    book([past[0], upcoming[0]])
+    few = count_statements()
+    half = args.bookings // 2
+    book(past[1:1 + half] + upcoming[1:1 + args.bookings - half])
+    many = count_statements()
+
+    with app.app_context():
+        booking_count = Booking.query.count()
+    results = {
+        'database': database_name(app),
+        'teachers': args.teachers,
+        'bookings': booking_count,
+        'per_page': app.config['MAX_SLOTS_PER_PAGE'],
+        'routes': {path: {'few_bookings': few[path], 'many_bookings': many[path]} for _, path in ROUTES},
+    }
+    grew = [path for _, path in ROUTES if many[path] > few[path]]
+    results['grew'] = grew
+    report(results, args.json)
+    if grew:
+        sys.exit(f'SQL statements grew with the number of bookings on: {", ".join(grew)}')
+
+
+if __name__ == '__main__':
+    main()
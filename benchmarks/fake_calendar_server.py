@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Google Calendar v3 API with injectable latency and errors.
+
+Serves the calls the app makes (``events.insert``, ``events.delete``, their
+multipart batch requests and ``events.list`` with sync tokens) over real
+HTTP, so ``GoogleCalendarClient`` runs unchanged, socket timeouts included,
+against a server that can be made slow or broken at will:
+
+    python benchmarks/fake_calendar_server.py --port 8765 --latency-ms 2000
+
+``latency`` (seconds, per HTTP request: a batch costs one round trip) and
+``error_rate`` (fraction answered with 503) can be changed while the server
+runs. ``redirected_http`` builds a transport that sends the client's
+``https://www.googleapis.com/`` requests to the fake server instead.
+"""
+
+import argparse
+import email
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GOOGLE_ROOT = 'https://www.googleapis.com/'
+EVENTS_PATH = re.compile(r'^/calendar/v3/calendars/(?P<calendar>[^/]+)/events(?:/(?P<event>[^/?]+))?$')
+REASONS = {200: 'OK', 204: 'No Content', 404: 'Not Found', 503: 'Service Unavailable'}
+
+
+class FakeCalendarServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0):
+        super().__init__(('127.0.0.1', port), CalendarHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.events = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        # Change sequence number of every event ever touched; sync tokens are sequence numbers
+        self.changed = {}
+        self.sequence = 0
+        # Sync tokens below this are answered with 410 Gone
+        self.oldest_token = 0
+
+    def touch(self, event_id):
+        self.sequence += 1
+        self.changed[event_id] = self.sequence
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up waiting (timeouts) close the connection mid-response
+        pass
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-calendar', daemon=True).start()
+        return self
+
+    def call(self, method, path, body):
+        """``(status, json body or None)`` for one Calendar API call"""
+        url = urllib.parse.urlparse(path)
+        path, query = url.path, dict(urllib.parse.parse_qsl(url.query))
+        match = EVENTS_PATH.match(path)
+        if match is None:
+            return 404, {'error': {'code': 404, 'message': f'No route for {method} {path}'}}
+        event_id = match.group('event') and urllib.parse.unquote(match.group('event'))
+        with self.lock:
+            if method == 'POST' and event_id is None:
+                event = dict(json.loads(body or '{}'), id=uuid.uuid4().hex, status='confirmed')
+                self.events[event['id']] = event
+                self.touch(event['id'])
+                return 200, event
+            if method == 'DELETE' and event_id:
+                if self.events.pop(event_id, None) is None:
+                    return 404, {'error': {'code': 404, 'message': 'Not Found'}}
+                self.touch(event_id)
+                return 204, None
+            if method == 'GET' and event_id is None:
+                return self.list(query)
+        return 404, {'error': {'code': 404, 'message': f'Unsupported call {method} {path}'}}
+
+    def list(self, query):
+        """One page of ``events.list``; the caller holds the lock"""
+        if query.get('syncToken'):
+            since = int(query['syncToken'])
+            if since < self.oldest_token:
+                return 410, {'error': {'code': 410, 'message': 'Sync token is no longer valid'}}
+            ids = [event_id for event_id, sequence in self.changed.items() if sequence > since]
+        else:
+            low, high = query['timeMin'][:19], query['timeMax'][:19]
+            ids = [event_id for event_id, event in self.events.items()
+                   if low <= event.get('start', {}).get('dateTime', '')[:19] < high]
+        offset = int(query.get('pageToken') or 0)
+        size = int(query.get('maxResults') or 250)
+        page = {'items': [self.events.get(event_id, {'id': event_id, 'status': 'cancelled'})
+                          for event_id in ids[offset:offset + size]]}
+        if offset + size < len(ids):
+            page['nextPageToken'] = str(offset + size)
+        else:
+            page['nextSyncToken'] = str(self.sequence)
+        return 200, page
+
+
+class CalendarHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            return self._send(503, 'application/json', json.dumps({'error': {'code': 503}}).encode())
+        if self.path.startswith('/batch/'):
+            return self._batch(body)
+        status, payload = server.call(self.command, self.path, body.decode())
+        self._send(status, 'application/json', json.dumps(payload).encode() if payload is not None else b'')
+
+    do_GET = do_POST = do_DELETE = do_PATCH = _handle
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _batch(self, body):
+        message = email.message_from_bytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            request = part.get_payload()
+            request_line, rest = request.split('\n', 1)
+            method, path, _ = request_line.split(' ', 2)
+            sub_body = re.split(r'\r?\n\r?\n', rest, 1)[1] if re.search(r'\r?\n\r?\n', rest) else ''
+            status, payload = self.server.call(method, path, sub_body)
+            content = json.dumps(payload) if payload is not None else ''
+            # The client's generator folds long Content-ID headers
+            content_id = re.sub(r'\r?\n', '', part['Content-ID']).strip('<>')
+            parts.append(
+                f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n'
+                f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\nContent-Type: application/json\r\n\r\n{content}\r\n'
+            )
+        response = ''.join(parts) + f'--{boundary}--\r\n'
+        self._send(200, f'multipart/mixed; boundary={boundary}', response.encode())
+
+
+class RedirectedHttp:
+    """httplib2 transport that sends Google API requests to ``base_url``"""
+
+    def __init__(self, base_url, timeout=None):
+        import httplib2
+        self.base_url = base_url
+        self.http = httplib2.Http(timeout=timeout)
+
+    def request(self, uri, *args, **kwargs):
+        return self.http.request(uri.replace(GOOGLE_ROOT, self.base_url, 1), *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+def redirected_http(base_url, timeout=None):
+    """``http_factory`` for ``GoogleCalendarClient`` that talks to a fake server"""
+    return lambda: RedirectedHttp(base_url, timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=int, default=0, help='delay of every HTTP request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    args = parser.parse_args()
+    server = FakeCalendarServer(args.port, args.latency_ms / 1000, args.error_rate)
+    print(f'Fake Calendar API on {server.url} (latency {args.latency_ms}ms, error rate {args.error_rate})')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
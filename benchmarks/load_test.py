@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Load test of the booking workflow against a seeded scratch database.
+
+Seeds ``--teachers`` teachers, one admin, ``--slots`` slots and ``--bookings``
+bookings, then drives the real app through these scenarios:
+
+* ``browse``: teachers open the calendar page (GET /teacher_slots)
+* ``ajax_slots``: AJAX slot table of one day (GET /teacher_slots?date=...)
+* ``book_storm``: ``--concurrency`` teachers race for the same slot, slot after slot
+* ``admin_dashboard``: admin dashboard pages (GET /admin?page=N)
+* ``bulk_create``: bulk slot preview and confirmation for new date ranges
+
+``--driver test-client`` runs the app in this process through Flask's test
+client. ``--driver gunicorn`` starts ``--workers`` gunicorn workers on a local
+port and sends real HTTP requests. Either way the Google Calendar client is
+the in-memory fake (``CALENDAR_CLIENT=fake``), optionally with
+``--calendar-latency-ms`` per call.
+
+For every scenario the report gives p50/p95/p99 latency, throughput, status
+codes and the SQL statements per request (from the ``X-SQL-Statements``
+response header). Results are printed and written to ``--json`` so runs can
+be compared across changes:
+
+    python benchmarks/load_test.py --teachers 1000 --slots 100000 --bookings 20000
+    python benchmarks/load_test.py --driver gunicorn --workers 4 --json after.json
+    python benchmarks/load_test.py --scenario book_storm --scenario ajax_slots
+
+Runs against a scratch database (see ``_harness``).
+"""
+
+import http.cookiejar
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from _harness import (
+    INSERT_CHUNK, PASSWORD, ROOT, argument_parser, database_name, percentile, report, scratch_app,
+    seed_slots, seed_users,
+)
+
+SCENARIOS = ('browse', 'ajax_slots', 'book_storm', 'admin_dashboard', 'bulk_create')
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--driver', choices=('test-client', 'gunicorn'), default='test-client')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--teachers', type=int, default=200)
+    parser.add_argument('--slots', type=int, default=20000)
+    parser.add_argument('--slots-per-day', type=int, default=24, help='seeded slots per day (max 48)')
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--scenario', action='append', dest='scenarios', choices=SCENARIOS,
+                        help='scenario to run, repeatable (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per scenario')
+    parser.add_argument('--calendar-latency-ms', type=int, default=0, help='delay of each fake Calendar call')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the data and request mix')
+    return parser.parse_args()
+
+
+# Seeding
+
+def seed(app, args):
+    """Fill the database with Core bulk inserts; returns what the scenarios need"""
+    from sqlalchemy import insert
+    from application.models import db, Slot, Booking
+
+    rng = random.Random(args.seed)
+    slots_per_day = max(1, min(args.slots_per_day, 48))
+    first_day = date.today() - timedelta(days=30)
+    started = time.perf_counter()
+    teacher_ids = seed_users(app, teachers=args.teachers, admin=True)
+    # Half-hour slots from 08:00, starting 30 days ago so dashboards have past bookings
+    slot_ids = seed_slots(app, first_day, args.slots, per_day=slots_per_day, start_hour=8, minutes=30)
+    with app.app_context():
+        booked = rng.sample(slot_ids, min(args.bookings, len(slot_ids)))
+        for i in range(0, len(booked), INSERT_CHUNK):
+            db.session.execute(insert(Booking.__table__), [
+                {'user_id': rng.choice(teacher_ids), 'slot_id': slot_id, 'description': 'seed',
+                 'event_id': f'seed{slot_id}', 'calendar_status': 'synced'}
+                for slot_id in booked[i:i + INSERT_CHUNK]
+            ])
+        db.session.commit()
+
+        today = date.today()
+        booked = set(booked)
+        free_future = [slot_id for slot_id, slot_date in db.session.query(Slot.id, Slot.slot_date)
+                       .filter(Slot.slot_date > today).order_by(Slot.id) if slot_id not in booked]
+        last_day = first_day + timedelta(days=(args.slots - 1) // slots_per_day)
+
+    return {
+        'seconds': round(time.perf_counter() - started, 2),
+        'teacher_count': len(teacher_ids),
+        'free_future_slots': free_future,
+        'first_day': first_day,
+        'last_day': last_day,
+    }
+
+
+# Drivers: each session keeps its own login cookie
+
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers)
+        response.get_data()  # consume streamed templates
+        return response.status_code, response.headers.get('X-SQL-Statements')
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers or {}, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('X-SQL-Statements')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('X-SQL-Statements')
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.app = app
+
+    def session(self):
+        return TestClientSession(self.app)
+
+    def stop(self):
+        pass
+
+
+class GunicornDriver:
+    def __init__(self, env, workers, log_path):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        self.log = open(log_path, 'w')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(workers), 'app:app'],
+            cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(self.base_url + '/healthz', timeout=2):
+                    return
+            except OSError:
+                if self.process.poll() is not None:
+                    break
+                time.sleep(0.2)
+        self.stop()
+        sys.exit(f'gunicorn did not become healthy, see {log_path}')
+
+    def session(self):
+        return HttpSession(self.base_url)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+# Scenarios
+
+class Recorder:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def call(self, session, method, path, data=None, headers=None):
+        started = time.perf_counter()
+        status, statements = session.request(method, path, data=data, headers=headers)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(elapsed)
+            self.statuses[status] += 1
+            if statements is not None:
+                self.statements.append(int(statements))
+        return status
+
+    def report(self, wall):
+        latencies = sorted(self.latencies)
+        result = {
+            'requests': len(latencies),
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+            'status_codes': {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+        if latencies:
+            result.update({
+                'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+                'max_ms': round(latencies[-1] * 1000, 2),
+            })
+        if self.statements:
+            result['sql_statements_mean'] = round(statistics.mean(self.statements), 2)
+            result['sql_statements_max'] = max(self.statements)
+        return result
+
+
+def run_pool(count, concurrency, work):
+    """Call ``work(i)`` for i in range(count) on ``concurrency`` threads; returns wall seconds"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(work, i) for i in range(count)]:
+            future.result()
+    return time.perf_counter() - started
+
+
+def scenario_browse(ctx, recorder):
+    def work(i):
+        recorder.call(ctx['teachers'][i % len(ctx['teachers'])], 'GET', '/teacher_slots')
+    return run_pool(ctx['args'].requests, ctx['args'].concurrency, work)
+
+
+def scenario_ajax_slots(ctx, recorder):
+    rng = random.Random(ctx['args'].seed)
+    today = date.today()
+    span = max(0, (min(ctx['last_day'], today.replace(month=12, day=31)) - today).days)
+    days = [today + timedelta(days=rng.randint(0, span)) for _ in range(ctx['args'].requests)]
+
+    def work(i):
+        recorder.call(ctx['teachers'][i % len(ctx['teachers'])], 'GET', f'/teacher_slots?date={days[i]}',
+                      headers={'X-Requested-With': 'XMLHttpRequest'})
+    return run_pool(ctx['args'].requests, ctx['args'].concurrency, work)
+
+
+def scenario_book_storm(ctx, recorder):
+    concurrency = ctx['args'].concurrency
+    rounds = max(1, ctx['args'].requests // concurrency)
+    targets = ctx['free_future_slots'][:rounds]
+    ctx['free_future_slots'] = ctx['free_future_slots'][rounds:]
+    racers = ctx['teachers'][:concurrency]
+
+    started = time.perf_counter()
+    for slot_id in targets:
+        barrier = threading.Barrier(len(racers))
+
+        def contend(session):
+            barrier.wait()
+            recorder.call(session, 'POST', f'/book/{slot_id}', data={'description': 'load test'})
+
+        threads = [threading.Thread(target=contend, args=(session,)) for session in racers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    ctx['storm_slots'] = targets
+    return time.perf_counter() - started
+
+
+def scenario_admin_dashboard(ctx, recorder):
+    pages = max(1, ctx['bookings'] // ctx['per_page'])
+    rng = random.Random(ctx['args'].seed)
+    requested = [rng.randint(1, pages) for _ in range(ctx['args'].requests)]
+
+    def work(i):
+        recorder.call(ctx['admin'], 'GET', f'/admin?page={requested[i]}')
+    return run_pool(ctx['args'].requests, ctx['args'].concurrency, work)
+
+
+def scenario_bulk_create(ctx, recorder):
+    # One preview and one confirmation per 30 day range after the seeded slots
+    ranges = max(1, ctx['args'].requests // 20)
+    started = time.perf_counter()
+    for i in range(ranges):
+        first = ctx['last_day'] + timedelta(days=1 + 30 * i)
+        form = {'start_date': first.isoformat(), 'end_date': (first + timedelta(days=29)).isoformat(),
+                'start_time': '08:00', 'end_time': '20:00', 'duration': '30'}
+        recorder.call(ctx['admin'], 'POST', '/admin/create_bulk_slots', data={**form, 'exclude_days': ['Sunday']})
+        recorder.call(ctx['admin'], 'POST', '/admin/confirm_bulk_slots', data={**form, 'excluded[]': ['Sunday']})
+    return time.perf_counter() - started
+
+
+SCENARIO_FUNCTIONS = {
+    'browse': scenario_browse,
+    'ajax_slots': scenario_ajax_slots,
+    'book_storm': scenario_book_storm,
+    'admin_dashboard': scenario_admin_dashboard,
+    'bulk_create': scenario_bulk_create,
+}
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    app = scratch_app('load_test', args.database_url, workdir, CALENDAR_CLIENT='fake',
+                      CALENDAR_FAKE_LATENCY_MS=args.calendar_latency_ms, CALENDAR_SYNC_ENABLED='true',
+                      METRICS_RESPONSE_HEADERS='true')
+    from app import calendar_sync_worker
+    from application.models import db, Booking
+
+    data = seed(app, args)
+
+    if args.driver == 'gunicorn':
+        driver = GunicornDriver(dict(os.environ), args.workers, os.path.join(workdir, 'gunicorn.log'))
+    else:
+        driver = TestClientDriver(app)
+
+    try:
+        teachers = []
+        for i in range(min(args.teachers, max(args.concurrency, 32))):
+            session = driver.session()
+            session.request('POST', '/login', data={'username': f'teacher{i}', 'password': PASSWORD})
+            teachers.append(session)
+        admin = driver.session()
+        admin.request('POST', '/login', data={'username': 'admin', 'password': PASSWORD})
+
+        ctx = {'args': args, 'teachers': teachers, 'admin': admin, 'bookings': args.bookings,
+               'per_page': app.config['MAX_SLOTS_PER_PAGE'], **data}
+        results = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'driver': args.driver,
+            'workers': args.workers if args.driver == 'gunicorn' else 1,
+            'database': database_name(app),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'dataset': {'teachers': args.teachers, 'slots': args.slots, 'bookings': args.bookings,
+                        'seed_seconds': data['seconds']},
+            'concurrency': args.concurrency,
+            'calendar_latency_ms': args.calendar_latency_ms,
+            'scenarios': {},
+        }
+        for name in args.scenarios or SCENARIOS:
+            recorder = Recorder()
+            wall = SCENARIO_FUNCTIONS[name](ctx, recorder)
+            results['scenarios'][name] = recorder.report(wall)
+            print(f'{name}: {results["scenarios"][name]}', file=sys.stderr)
+    finally:
+        driver.stop()
+        calendar_sync_worker.stop()
+
+    if 'storm_slots' in ctx:
+        with app.app_context():
+            per_slot = Counter(slot_id for (slot_id,) in db.session.query(Booking.slot_id)
+                               .filter(Booking.slot_id.in_(ctx['storm_slots'])))
+        results['scenarios']['book_storm']['booked_slots'] = len(per_slot)
+        results['scenarios']['book_storm']['double_booked_slots'] = sum(1 for n in per_slot.values() if n > 1)
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
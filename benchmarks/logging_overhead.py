@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Booking latency with logging off, written synchronously, and queued.
+
+A logged-in teacher books free slots through the Flask test client,
+cycling through the modes so each gets ``--bookings`` requests:
+
+* ``off``: no log handlers, per-request metrics lines disabled
+* ``sync``: JSON lines written by a RotatingFileHandler on the request thread
+* ``queue``: the production setup, records handed to a QueueListener thread
+
+    python benchmarks/logging_overhead.py
+    python benchmarks/logging_overhead.py --bookings 500 --json logging.json
+
+Log files go to a temporary directory. Runs against a scratch database (see
+``_harness``).
+"""
+
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, login, percentile, report, scratch_app, seed_slots, seed_users
+
+MODES = ('off', 'sync', 'queue')
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--bookings', type=int, default=200, help='bookings measured per mode')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp()
+    app = scratch_app('logging_overhead', args.database_url, workdir)
+    from app import request_metrics
+    from application.logs import setup_logging
+
+    seed_users(app, teachers=1)
+    slot_ids = iter(seed_slots(app, date.today() + timedelta(days=1), args.bookings * len(MODES)))
+    client = login(app, 'teacher0')
+
+    # Build every mode's handlers once, then interleave the modes booking by
+    # booking so that drift over the run affects them all equally
+    loggers = (app.logger, logging.getLogger('application'))
+    handlers, listeners = {}, []
+    for mode in MODES:
+        for logger in loggers:
+            logger.handlers.clear()
+        if mode != 'off':
+            listener = setup_logging(app, os.path.join(workdir, f'{mode}.log'), use_queue=mode == 'queue')
+            if listener is not None:
+                listeners.append(listener)
+        handlers[mode] = [list(logger.handlers) for logger in loggers]
+
+    latencies = {mode: [] for mode in MODES}
+    for _ in range(args.bookings):
+        for mode in MODES:
+            for logger, mode_handlers in zip(loggers, handlers[mode]):
+                logger.handlers = mode_handlers
+                logger.setLevel(logging.INFO if mode_handlers else logging.WARNING)
+            request_metrics.log_requests = mode != 'off'
+            with client.session_transaction() as session:
+                # Flash messages are never rendered here and would grow the session cookie
+                session.pop('_flashes', None)
+
+            started = time.perf_counter()
+            response = client.post(f'/book/{next(slot_ids)}', data={'description': 'logging benchmark'})
+            latencies[mode].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                sys.exit(f'Booking failed in {mode} mode with status {response.status_code}')
+    for listener in listeners:
+        listener.stop()
+
+    results = {'database': database_name(app), 'bookings': args.bookings, 'modes': {}}
+    for mode in MODES:
+        values = sorted(latencies[mode])
+        results['modes'][mode] = {
+            'mean_ms': round(statistics.mean(values) * 1000, 3),
+            'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        }
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
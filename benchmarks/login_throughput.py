@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Login cost per gunicorn worker for one or more password hash settings.
+
+For every ``--method`` a teacher is seeded with a hash made by that method and
+``--logins`` POST /login requests are sent through the Flask test client one
+at a time, the way a sync gunicorn worker serves them. The report gives the
+raw verify time, the end-to-end login latency, the logins per second one
+worker sustains and how many workers a ``--peak-rps`` login spike needs:
+
+    python benchmarks/login_throughput.py
+    python benchmarks/login_throughput.py --method scrypt:32768:8:1 --method pbkdf2:sha256:600000 \\
+        --peak-rps 20 --json logins.json
+
+Password hashing is CPU bound, so workers beyond the number of cores do not
+add login throughput. Runs against a scratch database (see ``_harness``).
+"""
+
+import math
+import os
+import sys
+import time
+
+from _harness import PASSWORD, argument_parser, database_name, percentile, report, scratch_app
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--method', action='append', dest='methods',
+                        help='werkzeug hash method, repeatable (default: the configured PASSWORD_HASH_METHOD)')
+    parser.add_argument('--logins', type=int, default=50, help='logins measured per method')
+    parser.add_argument('--peak-rps', type=float, default=10, help='login spike to size workers for')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('login_throughput', args.database_url)
+    from application.models import db, User
+    from application.passwords import hash_password, verify_password
+
+    methods = args.methods or [app.config['PASSWORD_HASH_METHOD']]
+    password = PASSWORD
+
+    results = {'database': database_name(app), 'cpu_count': os.cpu_count(),
+               'peak_rps': args.peak_rps, 'methods': []}
+    for i, method in enumerate(methods):
+        app.config['PASSWORD_HASH_METHOD'] = method
+        username = f'teacher{i}'
+        with app.app_context():
+            started = time.perf_counter()
+            stored = hash_password(password, method)
+            hash_ms = (time.perf_counter() - started) * 1000
+            db.session.add(User(first_name='Teacher', last_name=str(i), email=f'{username}@example.com',
+                                username=username, password=stored, role='teacher'))
+            db.session.commit()
+
+        started = time.perf_counter()
+        verify_password(stored, password)
+        verify_ms = (time.perf_counter() - started) * 1000
+
+        latencies = []
+        client = app.test_client()
+        for _ in range(args.logins):
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': username, 'password': password})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 302:
+                sys.exit(f'Login failed for {method} with status {response.status_code}')
+        latencies.sort()
+
+        mean = sum(latencies) / len(latencies)
+        per_worker = 1 / mean
+        results['methods'].append({
+            'method': method,
+            'hash_ms': round(hash_ms, 2),
+            'verify_ms': round(verify_ms, 2),
+            'login_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'login_p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'logins_per_second_per_worker': round(per_worker, 1),
+            'workers_for_peak': math.ceil(args.peak_rps / per_worker),
+        })
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+SQL statements issued per request on the main routes.
+
+Seeds a teacher, an admin, future slots and a few bookings, logs both in with
+test clients and counts the statements each route sends to the database
+(via the engine's ``before_cursor_execute`` event). Every route is measured
+with the user principal cache disabled (the user is loaded from the DB on
+every request) and enabled:
+
+    python benchmarks/queries_per_request.py
+    python benchmarks/queries_per_request.py --repeat 10 --json queries.json
+
+The reported count is the median over ``--repeat`` requests, so caches are
+warm after the first one. Runs against a scratch database (see ``_harness``).
+"""
+
+import statistics
+import sys
+from datetime import date, timedelta
+
+from _harness import argument_parser, database_name, login, report, scratch_app, seed_slots, seed_users
+
+
+def parse_args():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--repeat', type=int, default=5, help='requests per route and mode')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = scratch_app('queries_per_request', args.database_url)
+    from sqlalchemy import event
+    from app import principal_cache
+    from application.models import db, Booking
+
+    first_day = date.today() + timedelta(days=1)
+    (teacher_id,) = seed_users(app, teachers=1, admin=True)
+    slot_ids = seed_slots(app, first_day, 2 * args.repeat + 10)
+    with app.app_context():
+        db.session.add_all(Booking(user_id=teacher_id, slot_id=slot_id, description='seed')
+                           for slot_id in slot_ids[:5])
+        db.session.commit()
+        engine = db.engine
+
+    teacher, admin = login(app, 'teacher0'), login(app, 'admin')
+
+    free_slots = iter(slot_ids[5:])
+    routes = [
+        ('GET /teacher', lambda: teacher.get('/teacher')),
+        ('GET /teacher_slots', lambda: teacher.get('/teacher_slots')),
+        ('GET /teacher_slots?date', lambda: teacher.get(f'/teacher_slots?date={first_day}',
+                                                        headers={'X-Requested-With': 'XMLHttpRequest'})),
+        ('POST /book/<id>', lambda: teacher.post(f'/book/{next(free_slots)}', data={'description': 'bench'})),
+        ('GET /admin', lambda: admin.get('/admin')),
+        ('GET /admin/slots', lambda: admin.get('/admin/slots')),
+    ]
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *a: statements.append(1))
+
+    results = {'database': database_name(app), 'repeat': args.repeat, 'routes': {}}
+    for enabled in (False, True):
+        principal_cache.enabled = enabled
+        principal_cache.backend.clear()
+        mode = 'principal_cache' if enabled else 'no_principal_cache'
+        for name, request in routes:
+            counts = []
+            for _ in range(args.repeat):
+                statements.clear()
+                response = request()
+                if response.status_code >= 400:
+                    sys.exit(f'{name} returned {response.status_code}')
+                counts.append(len(statements))
+            results['routes'].setdefault(name, {})[mode] = statistics.median(counts)
+
+    report(results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Query plans and timings of the hot slot/booking queries, before and after the
+indexes added to Slot and Booking.
+
+Seeds a scratch database (SQLite by default) with the pre-index schema, runs
+each query, adds the indexes and runs them again:
+
+    python benchmarks/query_plans.py --slots 100000 --bookings 20000
+    python benchmarks/query_plans.py --database-url postgresql://... --json results.json
+
+Without the booking.slot_id index every ``~Slot.bookings.any()`` check scans the
+booking table per slot, so the "before" phase at 100k slots takes minutes.
+
+Unlike the other benchmarks this one builds its own schema instead of the
+app's, but the scratch database rules are the same (see ``_harness``).
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from _harness import ROOT, argument_parser, scratch_database_url, slot_rows
+
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.orm import configure_mappers
+
+from application.models import User, Slot, Booking
+
+# Schema as it was before the indexes, matching the baseline migration
+BASELINE_DDL = [
+    'CREATE TABLE "user" (id INTEGER PRIMARY KEY, first_name VARCHAR(80) NOT NULL, '
+    'last_name VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE, '
+    'username VARCHAR(80) NOT NULL UNIQUE, password VARCHAR(200) NOT NULL, role VARCHAR(10) NOT NULL)',
+    'CREATE TABLE slot (id INTEGER PRIMARY KEY, slot_date DATE NOT NULL, slot_start_time TIME NOT NULL, '
+    'slot_end_time TIME NOT NULL, available BOOLEAN)',
+    'CREATE TABLE booking (id INTEGER PRIMARY KEY, user_id INTEGER REFERENCES "user" (id), '
+    'slot_id INTEGER REFERENCES slot (id), description VARCHAR(255), event_id VARCHAR(80), '
+    "calendar_status VARCHAR(20) NOT NULL DEFAULT 'synced')",
+]
+
+INDEX_DDL = [
+    'CREATE UNIQUE INDEX uq_slot_date_times ON slot (slot_date, slot_start_time, slot_end_time)',
+    'CREATE INDEX ix_slot_date_available ON slot (slot_date, available)',
+    'CREATE UNIQUE INDEX uq_booking_slot_id ON booking (slot_id)',
+    'CREATE INDEX ix_booking_user_id ON booking (user_id)',
+]
+
+
+def seed(engine, slot_count, booking_count, teacher_count, seed_value):
+    rng = random.Random(seed_value)
+    with engine.begin() as conn:
+        for table in ('booking', 'slot', '"user"'):
+            conn.execute(text(f'DROP TABLE IF EXISTS {table}'))
+        for ddl in BASELINE_DDL:
+            conn.execute(text(ddl))
+
+        # Insert through the model tables so dates and times are bound correctly
+        conn.execute(insert(User.__table__), [{
+            'id': i, 'first_name': 'Teacher', 'last_name': str(i), 'email': f't{i}@example.com',
+            'username': f'teacher{i}', 'password': 'x', 'role': 'teacher',
+        } for i in range(1, teacher_count + 1)])
+
+        # 32 quarter-hour slots (09:00-17:00) per day, starting today
+        slots = [dict(row, id=i + 1, available=rng.random() > 0.1)
+                 for i, row in enumerate(slot_rows(date.today(), slot_count, per_day=32, minutes=15))]
+        conn.execute(insert(Slot.__table__), slots)
+
+        booked = rng.sample(range(1, slot_count + 1), min(booking_count, slot_count))
+        conn.execute(insert(Booking.__table__), [{
+            'id': i + 1, 'user_id': rng.randint(1, teacher_count), 'slot_id': slot_id,
+            'description': 'Lecture', 'event_id': f'evt{slot_id}', 'calendar_status': 'synced',
+        } for i, slot_id in enumerate(booked)])
+        return slots[len(slots) // 2]['slot_date']
+
+
+def queries(sample_date):
+    """The statements the routes issue, built from the real models"""
+    configure_mappers()  # sets up the Slot.bookings backref
+    return {
+        'slots_for_date': select(Slot.id).where(
+            Slot.slot_date == sample_date, Slot.available == True, ~Slot.bookings.any()),
+        'available_dates': select(Slot.slot_date).where(
+            Slot.available == True, ~Slot.bookings.any()).distinct(),
+        'bookings_for_user': select(Booking.id).where(Booking.user_id == 7),
+        'booking_for_slot': select(Booking.id).where(Booking.slot_id == 4242),
+        'existing_slots_in_range': select(Slot.slot_date, Slot.slot_start_time, Slot.slot_end_time).where(
+            Slot.slot_date >= sample_date, Slot.slot_date <= sample_date + timedelta(days=6)),
+    }
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(conn.engine, compile_kwargs={'literal_binds': True})
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.exec_driver_sql(prefix + str(compiled)).all()
+    return [' '.join(str(col) for col in row) for row in rows]
+
+
+def time_query(conn, stmt, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(stmt).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {'median_ms': round(timings[len(timings) // 2], 3), 'min_ms': round(timings[0], 3)}
+
+
+def run_phase(engine, statements, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in statements.items():
+            results[name] = {'plan': explain(conn, stmt), **time_query(conn, stmt, repeat)}
+    return results
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument('--slots', type=int, default=100000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--teachers', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    engine = create_engine(scratch_database_url('query_plans', args.database_url))
+
+    sample_date = seed(engine, args.slots, args.bookings, args.teachers, args.seed)
+    statements = queries(sample_date)
+
+    before = run_phase(engine, statements, args.repeat)
+    with engine.begin() as conn:
+        for ddl in INDEX_DDL:
+            conn.execute(text(ddl))
+        conn.execute(text('ANALYZE'))
+    after = run_phase(engine, statements, args.repeat)
+
+    for name in statements:
+        print(f'\n== {name}: {before[name]["median_ms"]} ms -> {after[name]["median_ms"]} ms (median)')
+        print('  before:')
+        for line in before[name]['plan']:
+            print(f'    {line}')
+        print('  after:')
+        for line in after[name]['plan']:
+            print(f'    {line}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'database': engine.dialect.name,
+                'slots': args.slots,
+                'bookings': args.bookings,
+                'before': before,
+                'after': after,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
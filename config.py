@@ -20,6 +20,20 @@ class Config:
     
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool (Postgres); SQLALCHEMY_ENGINE_OPTIONS is built from these in app.py
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    # Recycle before the server or a proxy drops idle connections
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Server-side statement timeout in milliseconds, 0 to disable
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    
+    # SQLite (development): WAL lets readers run alongside the writer
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', 'true').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    
     # Application settings
     APP_NAME = os.environ.get('APP_NAME', 'EduTube Slot Booking System')
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@edutube.com')
@@ -27,12 +41,106 @@ class Config:
     # Security settings
     FORCE_HTTPS = os.environ.get('FORCE_HTTPS', 'false').lower() == 'true'
     SESSION_TIMEOUT_MINUTES = int(os.environ.get('SESSION_TIMEOUT_MINUTES', 30))
+    # Number of proxies in front of the app whose X-Forwarded-For is trusted (1 on Render)
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
     
     # Google Calendar settings
     GOOGLE_CREDENTIALS_PATH = os.environ.get('GOOGLE_CREDENTIALS_PATH', 'google_credentials.json')
+    GOOGLE_CALENDAR_ID = os.environ.get(
+        'GOOGLE_CALENDAR_ID',
+        '36b6b142b66921e3359c57c8134b2bdaf3e274e3cd5d6752677b6f8321bbaf70@group.calendar.google.com'
+    )
+    CALENDAR_TIME_ZONE = os.environ.get('CALENDAR_TIME_ZONE', 'Asia/Kolkata')
+    # 'google', or 'fake' for the in-memory stand-in used by local runs and load tests
+    CALENDAR_CLIENT = os.environ.get('CALENDAR_CLIENT', 'google')
+    CALENDAR_FAKE_LATENCY_MS = int(os.environ.get('CALENDAR_FAKE_LATENCY_MS', 0))
+    
+    # Calendar sync worker settings (bookings are pushed to Google in the background)
+    CALENDAR_SYNC_ENABLED = os.environ.get('CALENDAR_SYNC_ENABLED', 'true').lower() == 'true'
+    CALENDAR_SYNC_INTERVAL_SECONDS = float(os.environ.get('CALENDAR_SYNC_INTERVAL_SECONDS', 5))
+    CALENDAR_SYNC_BATCH_SIZE = int(os.environ.get('CALENDAR_SYNC_BATCH_SIZE', 20))
+    CALENDAR_SYNC_MAX_ATTEMPTS = int(os.environ.get('CALENDAR_SYNC_MAX_ATTEMPTS', 8))
+    CALENDAR_SYNC_BACKOFF_SECONDS = int(os.environ.get('CALENDAR_SYNC_BACKOFF_SECONDS', 30))
+    # Threads making the API calls of one sync pass (1 = one call after another)
+    CALENDAR_SYNC_CONCURRENCY = int(os.environ.get('CALENDAR_SYNC_CONCURRENCY', 1))
+    # Event deletes a bulk slot deletion sends inline (one batch request); the rest go to the worker
+    CALENDAR_INLINE_DELETE_LIMIT = int(os.environ.get('CALENDAR_INLINE_DELETE_LIMIT', 50))
+    # Socket timeout of every Calendar API call (connect and each read)
+    CALENDAR_TIMEOUT_SECONDS = float(os.environ.get('CALENDAR_TIMEOUT_SECONDS', 10))
+    # Stop calling Google for CALENDAR_BREAKER_RESET_SECONDS after this many failures in a row (0 = never)
+    CALENDAR_BREAKER_FAILURES = int(os.environ.get('CALENDAR_BREAKER_FAILURES', 5))
+    CALENDAR_BREAKER_RESET_SECONDS = float(os.environ.get('CALENDAR_BREAKER_RESET_SECONDS', 60))
+    
+    # Reconciliation of bookings against the calendar (full sync daily, incremental in between)
+    CALENDAR_RECONCILE_ENABLED = os.environ.get('CALENDAR_RECONCILE_ENABLED', 'true').lower() == 'true'
+    CALENDAR_RECONCILE_INTERVAL_MINUTES = int(os.environ.get('CALENDAR_RECONCILE_INTERVAL_MINUTES', 30))
+    CALENDAR_RECONCILE_WINDOW_DAYS = int(os.environ.get('CALENDAR_RECONCILE_WINDOW_DAYS', 120))
+    CALENDAR_RECONCILE_BATCH_SIZE = int(os.environ.get('CALENDAR_RECONCILE_BATCH_SIZE', 50))
+    
+    # Teacher calendar availability cache: memory:// (per worker), redis://... or local-redis://.
+    # Keys carry the date's data version from the database, so a booking made through one
+    # worker is seen by all of them even with memory://; each worker just misses once.
+    AVAILABILITY_CACHE_URL = os.environ.get('AVAILABILITY_CACHE_URL', 'memory://')
+    AVAILABILITY_CACHE_SIZE = int(os.environ.get('AVAILABILITY_CACHE_SIZE', 4096))
+    # Entries are keyed by data version, so the TTL only bounds how long superseded ones linger
+    AVAILABILITY_CACHE_TTL = int(os.environ.get('AVAILABILITY_CACHE_TTL', 60))
+    
+    # Registration username/email availability checks
+    ACCOUNT_LOOKUP_CACHE_URL = os.environ.get('ACCOUNT_LOOKUP_CACHE_URL', 'memory://')
+    ACCOUNT_LOOKUP_CACHE_SIZE = int(os.environ.get('ACCOUNT_LOOKUP_CACHE_SIZE', 4096))
+    ACCOUNT_LOOKUP_CACHE_TTL = int(os.environ.get('ACCOUNT_LOOKUP_CACHE_TTL', 30))
+    # Per client (and per worker): sustained checks per second and burst size
+    CHECK_AVAILABILITY_RATE = float(os.environ.get('CHECK_AVAILABILITY_RATE', 3))
+    CHECK_AVAILABILITY_BURST = int(os.environ.get('CHECK_AVAILABILITY_BURST', 10))
+    
+    # Logged-in user principal cache; a TTL of 0 loads the user from the DB on every request
+    PRINCIPAL_CACHE_URL = os.environ.get('PRINCIPAL_CACHE_URL', 'memory://')
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 2048))
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+    
+    # Old slot cleanup (scheduler job and `flask purge-old-slots`)
+    CLEANUP_BATCH_SIZE = int(os.environ.get('CLEANUP_BATCH_SIZE', 500))
     
-    # Pagination settings
+    # werkzeug hash method and work factor; existing hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    
+    # Background scheduler; jobs run in whichever worker holds the DB lease
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 60))
+    SCHEDULER_SLOW_JOB_SECONDS = float(os.environ.get('SCHEDULER_SLOW_JOB_SECONDS', 30))
+    SCHEDULER_JOB_RUN_RETENTION_DAYS = int(os.environ.get('SCHEDULER_JOB_RUN_RETENTION_DAYS', 30))
+    AVAILABILITY_WARM_INTERVAL_MINUTES = int(os.environ.get('AVAILABILITY_WARM_INTERVAL_MINUTES', 10))
+    
+    # Request instrumentation: JSON request log lines, slow request/query warnings, /metrics
+    METRICS_LOG_REQUESTS = os.environ.get('METRICS_LOG_REQUESTS', 'true').lower() == 'true'
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 200))
+    # Add Server-Timing and X-SQL-Statements headers to responses (load tests, debugging)
+    METRICS_RESPONSE_HEADERS = os.environ.get('METRICS_RESPONSE_HEADERS', 'false').lower() == 'true'
+    # Bearer token required by /metrics; the endpoint answers 404 while it is unset
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Logging: records are written to the file by a background QueueListener thread
+    LOG_USE_QUEUE = os.environ.get('LOG_USE_QUEUE', 'true').lower() == 'true'
+    # Fraction of INFO records kept from the high-volume loggers (children of app.logger)
+    LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+    LOG_SAMPLED_LOGGERS = os.environ.get('LOG_SAMPLED_LOGGERS', 'metrics,booking')
+    
+    # HTTP caching: slot listings carry ETags built from per-date data versions, salted
+    # per deploy so changed templates are re-sent (Render sets RENDER_GIT_COMMIT)
+    ETAG_SALT = os.environ.get('ETAG_SALT') or os.environ.get('RENDER_GIT_COMMIT', '')
+    # Cache lifetime of fingerprinted static files (URLs carry a content hash)
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 31536000))
+    
+    # Pagination settings (also the default page size of the /api/v1 listings)
     MAX_SLOTS_PER_PAGE = int(os.environ.get('MAX_SLOTS_PER_PAGE', 50))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+    
+    # Booking limits per teacher, counted over bookings from today on (0 = no limit)
+    MAX_UPCOMING_BOOKINGS_PER_TEACHER = int(os.environ.get('MAX_UPCOMING_BOOKINGS_PER_TEACHER', 0))
+    MAX_BOOKINGS_PER_TEACHER_PER_DAY = int(os.environ.get('MAX_BOOKINGS_PER_TEACHER_PER_DAY', 0))
+    # Most slots one /book/batch request may claim
+    BATCH_BOOKING_MAX_SLOTS = int(os.environ.get('BATCH_BOOKING_MAX_SLOTS', 50))
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -49,12 +157,19 @@ class ProductionConfig(Config):
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutes
+    
+    # Stop runaway queries from holding pool connections
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # Tests drive the outbox directly with a fake calendar client
+    CALENDAR_SYNC_ENABLED = False
+    # Keep password hashing cheap in tests
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for production.
+
+Each worker starts the background scheduler once it has loaded the app; the
+scheduler lease in the database makes sure only one of them runs the jobs.
+
+Calendar API calls run on the calendar sync thread, not in requests, but a
+request can still wait on I/O (the database, bulk deletes flushing their
+calendar events). ``GUNICORN_WORKER_CLASS=gthread`` with ``GUNICORN_THREADS``
+lets each worker serve other requests meanwhile; ``gevent`` also works once
+the gevent package is installed.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+
+def post_worker_init(worker):
+    from app import initialize_scheduler
+    initialize_scheduler()
@@ -0,0 +1,62 @@
+"""baseline schema
+
+Revision ID: 3f1a2c9d8e01
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1a2c9d8e01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created before migrations were introduced already have these
+    # tables (startup.py used db.create_all()), so only create what is missing.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'user' not in existing:
+        op.create_table('user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('first_name', sa.String(length=80), nullable=False),
+            sa.Column('last_name', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('password', sa.String(length=200), nullable=False),
+            sa.Column('role', sa.String(length=10), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username')
+        )
+    if 'slot' not in existing:
+        op.create_table('slot',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('slot_date', sa.Date(), nullable=False),
+            sa.Column('slot_start_time', sa.Time(), nullable=False),
+            sa.Column('slot_end_time', sa.Time(), nullable=False),
+            sa.Column('available', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'booking' not in existing:
+        op.create_table('booking',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('slot_id', sa.Integer(), nullable=True),
+            sa.Column('description', sa.String(length=255), nullable=True),
+            sa.Column('event_id', sa.String(length=80), nullable=False),
+            sa.ForeignKeyConstraint(['slot_id'], ['slot.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('booking')
+    op.drop_table('slot')
+    op.drop_table('user')
@@ -0,0 +1,47 @@
+"""calendar outbox and booking calendar status
+
+Revision ID: 7b4e1d2a9c10
+Revises: 3f1a2c9d8e01
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4e1d2a9c10'
+down_revision = '3f1a2c9d8e01'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing bookings were written synchronously, so they are already synced
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.add_column(sa.Column('calendar_status', sa.String(length=20), nullable=False, server_default='synced'))
+        batch_op.alter_column('event_id', existing_type=sa.String(length=80), nullable=True)
+
+    op.create_table('calendar_outbox',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=True),
+        sa.Column('action', sa.String(length=10), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('event_id', sa.String(length=80), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_calendar_outbox_status_due', 'calendar_outbox', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_calendar_outbox_status_due', table_name='calendar_outbox')
+    op.drop_table('calendar_outbox')
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.alter_column('event_id', existing_type=sa.String(length=80), nullable=False)
+        batch_op.drop_column('calendar_status')
@@ -0,0 +1,28 @@
+"""per-date data version counters
+
+Revision ID: a1c7e9d3b508
+Revises: f3a8b1d5c927
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c7e9d3b508'
+down_revision = 'f3a8b1d5c927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('data_version',
+        sa.Column('slot_date', sa.Date(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('slot_date')
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,50 @@
+"""unique slot date and times
+
+Revision ID: a9d3c5e7f214
+Revises: 7b4e1d2a9c10
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3c5e7f214'
+down_revision = '7b4e1d2a9c10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge the duplicates left behind by the old per-slot existence check: each
+    # (date, start, end) group keeps one slot, its lowest booked id or else its
+    # lowest id, and the bookings of the others are moved onto it. Two bookings
+    # ending up on one slot are real double bookings, reported by c4e8f0a1b6d3.
+    bind = op.get_bind()
+    groups = bind.execute(sa.text("""
+        SELECT COALESCE(
+                   MIN(CASE WHEN id IN (SELECT slot_id FROM booking WHERE slot_id IS NOT NULL) THEN id END),
+                   MIN(id)
+               ) AS keep_id, slot_date, slot_start_time, slot_end_time
+        FROM slot
+        GROUP BY slot_date, slot_start_time, slot_end_time
+        HAVING COUNT(*) > 1
+    """)).all()
+    for keep_id, slot_date, start, end in groups:
+        params = {'keep_id': keep_id, 'slot_date': slot_date, 'start': start, 'end': end}
+        duplicates = """
+            SELECT id FROM slot
+            WHERE slot_date = :slot_date AND slot_start_time = :start AND slot_end_time = :end
+            AND id != :keep_id
+        """
+        bind.execute(sa.text(f"UPDATE booking SET slot_id = :keep_id WHERE slot_id IN ({duplicates})"), params)
+        bind.execute(sa.text(f"DELETE FROM slot WHERE id IN ({duplicates})"), params)
+
+    with op.batch_alter_table('slot') as batch_op:
+        batch_op.create_unique_constraint('uq_slot_date_times', ['slot_date', 'slot_start_time', 'slot_end_time'])
+
+
+def downgrade():
+    with op.batch_alter_table('slot') as batch_op:
+        batch_op.drop_constraint('uq_slot_date_times', type_='unique')
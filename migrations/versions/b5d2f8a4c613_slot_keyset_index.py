@@ -0,0 +1,24 @@
+"""slot keyset pagination index
+
+Revision ID: b5d2f8a4c613
+Revises: a1c7e9d3b508
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2f8a4c613'
+down_revision = 'a1c7e9d3b508'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_slot_date_start_id', 'slot', ['slot_date', 'slot_start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_slot_date_start_id', table_name='slot')
@@ -0,0 +1,39 @@
+"""slot and booking indexes, single booking per slot
+
+Revision ID: c4e8f0a1b6d3
+Revises: a9d3c5e7f214
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8f0a1b6d3'
+down_revision = 'a9d3c5e7f214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Double bookings cannot be resolved automatically; refuse to continue
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT slot_id FROM booking WHERE slot_id IS NOT NULL GROUP BY slot_id HAVING COUNT(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f'Slots with more than one booking must be cleaned up before upgrading: {duplicates}'
+        )
+
+    op.create_index('ix_slot_date_available', 'slot', ['slot_date', 'available'], unique=False)
+    op.create_index('ix_booking_user_id', 'booking', ['user_id'], unique=False)
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.create_unique_constraint('uq_booking_slot_id', ['slot_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_constraint('uq_booking_slot_id', type_='unique')
+    op.drop_index('ix_booking_user_id', table_name='booking')
+    op.drop_index('ix_slot_date_available', table_name='slot')
@@ -0,0 +1,32 @@
+"""calendar reconciliation sync state
+
+Revision ID: c8e4a2f6b917
+Revises: b5d2f8a4c613
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4a2f6b917'
+down_revision = 'b5d2f8a4c613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('calendar_sync_state',
+        sa.Column('calendar_id', sa.String(length=255), nullable=False),
+        sa.Column('sync_token', sa.Text(), nullable=True),
+        sa.Column('window_start', sa.Date(), nullable=True),
+        sa.Column('window_end', sa.Date(), nullable=True),
+        sa.Column('full_synced_at', sa.DateTime(), nullable=True),
+        sa.Column('synced_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('calendar_id')
+    )
+
+
+def downgrade():
+    op.drop_table('calendar_sync_state')
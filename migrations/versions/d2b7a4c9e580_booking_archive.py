@@ -0,0 +1,37 @@
+"""booking archive
+
+Revision ID: d2b7a4c9e580
+Revises: c4e8f0a1b6d3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7a4c9e580'
+down_revision = 'c4e8f0a1b6d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('booking_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('slot_date', sa.Date(), nullable=False),
+        sa.Column('slot_start_time', sa.Time(), nullable=False),
+        sa.Column('slot_end_time', sa.Time(), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('event_id', sa.String(length=80), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_booking_archive_user_id', 'booking_archive', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_booking_archive_user_id', table_name='booking_archive')
+    op.drop_table('booking_archive')
@@ -0,0 +1,35 @@
+"""hash remaining plaintext passwords
+
+Revision ID: d7a3f9b2c415
+Revises: c8e4a2f6b917
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+from application.passwords import hash_password, is_hashed
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f9b2c415'
+down_revision = 'c8e4a2f6b917'
+branch_labels = None
+depends_on = None
+
+user = sa.table('user', sa.column('id', sa.Integer), sa.column('password', sa.String))
+
+
+def upgrade():
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(user.c.id, user.c.password)).all()
+    for user_id, password in rows:
+        if not is_hashed(password):
+            conn.execute(user.update().where(user.c.id == user_id).values(password=hash_password(password, method)))
+
+
+def downgrade():
+    # The plaintext cannot be recovered from the hashes; hashed passwords keep working
+    pass
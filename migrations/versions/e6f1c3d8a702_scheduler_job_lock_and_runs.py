@@ -0,0 +1,43 @@
+"""scheduler job lock and job runs
+
+Revision ID: e6f1c3d8a702
+Revises: d2b7a4c9e580
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f1c3d8a702'
+down_revision = 'd2b7a4c9e580'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_lock',
+        sa.Column('name', sa.String(length=80), nullable=False),
+        sa.Column('owner', sa.String(length=120), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('job_run',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_name', sa.String(length=80), nullable=False),
+        sa.Column('owner', sa.String(length=120), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.Column('detail', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_run_name_started', 'job_run', ['job_name', 'started_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_run_name_started', table_name='job_run')
+    op.drop_table('job_run')
+    op.drop_table('job_lock')
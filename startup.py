@@ -77,13 +77,14 @@ def create_admin_user():
     try:
         with app.app_context():
             from application.models import User
+            from application.passwords import hash_password
             
             admin_user = User.query.filter_by(role='admin').first()
             if not admin_user:
                 # Create default admin user
                 admin = User(
                     username='admin',
-                    password='admin123',  # Should be changed after first login
+                    password=hash_password('admin123', app.config['PASSWORD_HASH_METHOD']),  # Should be changed after first login
                     email=app.config.get('ADMIN_EMAIL', 'admin@edutube.com'),
                     first_name='System',
                     last_name='Administrator',